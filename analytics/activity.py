@@ -0,0 +1,113 @@
+"""
+Buffered recording of course activity.
+
+Enrollments and content views are counted in memory per course and day and
+written out in one go once ANALYTICS_BUFFER_SIZE events have been recorded
+or ANALYTICS_BUFFER_SECONDS have passed, and when the process exits. A
+flush adds the counts to the CourseActivity rollup rows, so no per-event
+rows are stored and dashboards never aggregate raw enrollment tables.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('enrollments', 'content_views')
+
+
+class ActivityBuffer(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.events = 0
+        self.started = time.time()
+
+    def add(self, course_id, field, count=1):
+        today = timezone.localtime(timezone.now()).date()
+        with self.lock:
+            self.counts[(course_id, today, field)] += count
+            self.events += count
+            due = (self.events >= getattr(settings, 'ANALYTICS_BUFFER_SIZE', 500) or
+                   time.time() - self.started >= getattr(settings, 'ANALYTICS_BUFFER_SECONDS', 60))
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.events = 0
+            self.started = time.time()
+        if counts:
+            try:
+                rollup(counts)
+            except Exception:
+                logger.exception('Could not write %s activity counts', len(counts))
+
+
+def rollup(counts):
+    """
+    Add counts, a {(course_id, date, field): n} mapping, to the rollup rows.
+    """
+    from .models import CourseActivity
+
+    increments = defaultdict(dict)
+    for (course_id, date, field), count in counts.items():
+        increments[(course_id, date)][field] = count
+
+    course_ids = set(course_id for course_id, date in increments)
+    dates = set(date for course_id, date in increments)
+    with transaction.atomic():
+        existing = set(CourseActivity.objects.filter(course_id__in=course_ids, date__in=dates)
+                       .values_list('course_id', 'date'))
+        missing = [key for key in increments if key not in existing]
+        try:
+            with transaction.atomic():
+                CourseActivity.objects.bulk_create([
+                    CourseActivity(course_id=course_id, date=date, **increments[(course_id, date)])
+                    for course_id, date in missing])
+        except IntegrityError:
+            # another process created some of these rows in the meantime
+            for course_id, date in missing:
+                row, created = CourseActivity.objects.get_or_create(
+                    course_id=course_id, date=date, defaults=increments[(course_id, date)])
+                if not created:
+                    existing.add((course_id, date))
+        for course_id, date in existing:
+            CourseActivity.objects.filter(course_id=course_id, date=date).update(**{
+                field: F(field) + count
+                for field, count in increments[(course_id, date)].items()})
+
+
+buffer = ActivityBuffer()
+
+
+def record_enrollments(course_id, count=1):
+    buffer.add(course_id, 'enrollments', count)
+
+
+def record_content_view(course_id):
+    buffer.add(course_id, 'content_views')
+
+
+def flush():
+    buffer.flush()
+
+
+def enrollments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        # user.courses_joined.add(*courses)
+        for course_id in pk_set:
+            record_enrollments(course_id)
+    else:
+        # course.students.add(*users)
+        record_enrollments(instance.pk, len(pk_set))
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import CourseActivity
+
+# Register your models here.
+
+
+@admin.register(CourseActivity)
+class CourseActivityAdmin(admin.ModelAdmin):
+    list_display = ['course', 'date', 'enrollments', 'content_views']
+    list_filter = ['date']
+    list_select_related = ['course']
+    raw_id_fields = ['course']
+    date_hierarchy = 'date'
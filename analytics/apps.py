@@ -0,0 +1,18 @@
+from __future__ import unicode_literals
+
+import atexit
+
+from django.apps import AppConfig
+from django.db.models.signals import m2m_changed
+
+
+class AnalyticsConfig(AppConfig):
+    name = 'analytics'
+
+    def ready(self):
+        from courses.models import Course
+        from .activity import enrollments_changed, flush
+        m2m_changed.connect(enrollments_changed, sender=Course.students.through,
+                            dispatch_uid='analytics_enrollments')
+        # write out what is still buffered when the worker exits
+        atexit.register(flush)
@@ -0,0 +1,28 @@
+from django.core.urlresolvers import resolve, Resolver404
+
+from .activity import record_content_view
+
+# URL names of the pages that count as a content view of course <pk>
+CONTENT_VIEW_URLS = ('student_course_detail', 'student_course_detail_module')
+
+
+class ContentViewMiddleware(object):
+    """
+    Records a content view for every successful response of the student
+    course pages. The pages are cached by cache_page and the cache
+    middleware, which answer repeated requests without calling the view, so
+    counting happens here on the way out rather than in the view.
+    """
+    def process_response(self, request, response):
+        if request.method != 'GET' or response.status_code != 200:
+            return response
+        # cached responses never went through URL resolving
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return response
+        if match.url_name in CONTENT_VIEW_URLS:
+            record_content_view(int(match.kwargs['pk']))
+        return response
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseActivity',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('date', models.DateField()),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+                ('content_views', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(related_name='activity', to='courses.Course')),
+            ],
+            options={
+                'ordering': ('-date',),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='courseactivity',
+            unique_together=set([('course', 'date')]),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from __future__ import unicode_literals
+
+from django.db import models
+
+from courses.models import Course
+
+# Create your models here.
+
+
+class CourseActivity(models.Model):
+    """
+    Daily rollup of what happened in a course. Rows are only ever
+    incremented by analytics.activity, dashboards read them as they are.
+    """
+    course = models.ForeignKey(Course, related_name='activity')
+    date = models.DateField()
+    enrollments = models.PositiveIntegerField(default=0)
+    content_views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course', 'date')
+        ordering = ('-date',)
+
+    def __str__(self):
+        return '{} {}'.format(self.course_id, self.date)
@@ -0,0 +1,134 @@
+import datetime
+from collections import Counter
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from courses.models import Subject, Course, Module
+from . import activity
+from .models import CourseActivity
+
+# Create your tests here.
+
+
+@override_settings(SNAPSHOT_ROOT=None)
+class ActivityTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('instructor', password='secret')
+        self.subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = self.create_course('python')
+        self.today = timezone.localtime(timezone.now()).date()
+
+    def create_course(self, slug, owner=None):
+        return Course.objects.create(owner=owner or self.owner, subject=self.subject,
+                                     title=slug, slug=slug, overview='')
+
+    def row(self, date=None):
+        return CourseActivity.objects.get(course=self.course, date=date or self.today)
+
+
+class RollupTest(ActivityTestCase):
+
+    def test_creates_missing_rows(self):
+        activity.rollup(Counter({(self.course.id, self.today, 'enrollments'): 3,
+                                 (self.course.id, self.today, 'content_views'): 5}))
+        row = self.row()
+        self.assertEqual((row.enrollments, row.content_views), (3, 5))
+
+    def test_adds_to_existing_rows(self):
+        yesterday = self.today - datetime.timedelta(days=1)
+        CourseActivity.objects.create(course=self.course, date=yesterday,
+                                      enrollments=1, content_views=10)
+        activity.rollup(Counter({(self.course.id, yesterday, 'content_views'): 2,
+                                 (self.course.id, self.today, 'enrollments'): 1}))
+        row = self.row(yesterday)
+        self.assertEqual((row.enrollments, row.content_views), (1, 12))
+        self.assertEqual(self.row().enrollments, 1)
+
+
+class ActivityBufferTest(ActivityTestCase):
+
+    def setUp(self):
+        super(ActivityBufferTest, self).setUp()
+        patcher = mock.patch.object(activity, 'buffer', activity.ActivityBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counts_are_kept_until_flushed(self):
+        student = User.objects.create_user('student', password='secret')
+        self.course.students.add(student)
+        activity.record_content_view(self.course.id)
+        activity.record_content_view(self.course.id)
+        self.assertFalse(CourseActivity.objects.exists())
+
+        activity.flush()
+        row = self.row()
+        self.assertEqual((row.enrollments, row.content_views), (1, 2))
+        # a second flush has nothing left to add
+        activity.flush()
+        self.assertEqual(self.row().content_views, 2)
+
+    @override_settings(ANALYTICS_BUFFER_SIZE=3)
+    def test_flushes_when_full(self):
+        for i in range(3):
+            activity.record_content_view(self.course.id)
+        self.assertEqual(self.row().content_views, 3)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CourseActivityViewTest(ActivityTestCase):
+
+    def test_lists_own_courses_with_totals(self):
+        other = User.objects.create_user('other', password='secret')
+        other_course = self.create_course('django', owner=other)
+        yesterday = self.today - datetime.timedelta(days=1)
+        CourseActivity.objects.create(course=self.course, date=self.today,
+                                      enrollments=2, content_views=7)
+        CourseActivity.objects.create(course=self.course, date=yesterday,
+                                      enrollments=1, content_views=3)
+        CourseActivity.objects.create(course=other_course, date=self.today, enrollments=9)
+
+        self.client.login(username='instructor', password='secret')
+        response = self.client.get(reverse('course_activity'))
+        self.assertEqual(response.status_code, 200)
+        courses = list(response.context['object_list'])
+        self.assertEqual(courses, [self.course])
+        self.assertEqual(courses[0].total_enrollments, 3)
+        self.assertEqual(courses[0].total_content_views, 10)
+        self.assertEqual([row.date for row in courses[0].daily_activity], [self.today, yesterday])
+        # viewing the dashboard must not touch the rollups
+        self.assertEqual(CourseActivity.objects.filter(course=self.course).count(), 2)
+        self.assertContains(response, '3 enrollments, 10 content views')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ContentViewMiddlewareTest(ActivityTestCase):
+
+    def setUp(self):
+        super(ContentViewMiddlewareTest, self).setUp()
+        patcher = mock.patch.object(activity, 'buffer', activity.ActivityBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Module.objects.create(course=self.course, title='Introduction')
+        student = User.objects.create_user('student', password='secret')
+        self.course.students.add(student)
+        self.client.login(username='student', password='secret')
+
+    def test_cached_pages_are_counted(self):
+        url = reverse('student_course_detail', args=[self.course.id])
+        for i in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        activity.flush()
+        self.assertEqual(self.row().content_views, 3)
+
+    def test_other_pages_are_not_counted(self):
+        self.client.get(reverse('student_course_list'))
+        self.client.get(reverse('student_course_detail', args=[self.course.id + 1]))
+        activity.flush()
+        self.assertEqual(self.row().content_views, 0)
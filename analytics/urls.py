@@ -0,0 +1,8 @@
+from django.conf.urls import url
+
+from . import views
+
+urlpatterns = [
+    url(r'^courses/$', views.CourseActivityView.as_view(),
+        name='course_activity'),
+]
@@ -0,0 +1,35 @@
+import datetime
+from collections import defaultdict
+
+from django.utils import timezone
+
+from courses.views import ManageCourseListView
+from .models import CourseActivity
+
+# Create your views here.
+
+
+class CourseActivityView(ManageCourseListView):
+    """
+    The instructor's courses with their daily enrollments and content views,
+    read from the CourseActivity rollups only.
+    """
+    template_name = 'analytics/course/list.html'
+    days = 30
+
+    def get_context_data(self, **kwargs):
+        context = super(CourseActivityView, self).get_context_data(**kwargs)
+        since = timezone.localtime(timezone.now()).date() - datetime.timedelta(days=self.days - 1)
+        activity = defaultdict(list)
+        for row in CourseActivity.objects.filter(course__owner=self.request.user,
+                                                 date__gte=since):
+            activity[row.course_id].append(row)
+        courses = list(context['object_list'])
+        for course in courses:
+            # not course.activity, that is the reverse relation of the rollups
+            course.daily_activity = activity[course.id]
+            course.total_enrollments = sum(row.enrollments for row in course.daily_activity)
+            course.total_content_views = sum(row.content_views for row in course.daily_activity)
+        context['object_list'] = courses
+        context['days'] = self.days
+        return context
@@ -1,23 +1,204 @@
-from django.contrib import admin
-from .models import Subject, Course, Module
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth import get_permission_codename
+from django.core.exceptions import PermissionDenied
+from django.core.urlresolvers import reverse
+from django.db import transaction
+from django.db.models import Case, When, Value, Max, IntegerField
+from django.utils.html import format_html
+
+from .models import Subject, Course, Module, Content, Text, Video, Image, File, delete_items
+from .snapshot import course_modules_changed
 
 # Register your models here.
 
+# courses with more modules than this edit them on the Module changelist
+# instead of an inline, which would render every module on the page
+MODULE_INLINE_LIMIT = 30
+
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
     list_display = ['title', 'slug']
     prepopulated_fields = {'slug': ('title',)}
+    search_fields = ['title']
 
 
-class ModuleInline(admin.StackedInline):
+class ModuleInline(admin.TabularInline):
     model = Module
+    fields = ['order', 'title', 'description']
+    extra = 0
+    show_change_link = True
 
 
 @admin.register(Course)
 class CourceAdmin(admin.ModelAdmin):
     list_display = ['title', 'subject', 'created']
     list_filter = ['created', 'subject']
+    list_select_related = ['subject']
     search_fields = ['title', 'overview']
     prepopulated_fields = {'slug': ('title',)}
+    raw_id_fields = ['owner', 'subject']
+    readonly_fields = ['module_list']
     inlines = [ModuleInline]
+
+    def get_inline_instances(self, request, obj=None):
+        if obj is not None and obj.modules.count() > MODULE_INLINE_LIMIT:
+            return []
+        return super(CourceAdmin, self).get_inline_instances(request, obj)
+
+    def module_list(self, obj):
+        if obj.pk is None:
+            return ''
+        url = reverse('admin:courses_module_changelist')
+        return format_html('<a href="{}?course__id__exact={}">{} modules</a>',
+                           url, obj.pk, obj.modules.count())
+    module_list.short_description = 'modules'
+
+
+class BulkDeleteMixin(object):
+    """
+    The bulk delete actions named in delete_actions bypass delete_selected
+    and its checks, so they are only offered to users who may delete the
+    admin's model and every model in also_deletes.
+    """
+    delete_actions = []
+    also_deletes = [Content, Text, Video, Image, File]
+
+    def may_delete(self, request):
+        if not self.has_delete_permission(request):
+            return False
+        return all(request.user.has_perm('{}.{}'.format(
+            model._meta.app_label, get_permission_codename('delete', model._meta)))
+            for model in self.also_deletes)
+
+    def get_actions(self, request):
+        actions = super(BulkDeleteMixin, self).get_actions(request)
+        if not self.may_delete(request):
+            for name in self.delete_actions:
+                actions.pop(name, None)
+        return actions
+
+    def check_delete_permission(self, request):
+        if not self.may_delete(request):
+            raise PermissionDenied
+
+
+class ModuleActionForm(ActionForm):
+    course = forms.IntegerField(required=False, label='Target course id')
+
+
+@admin.register(Module)
+class ModuleAdmin(BulkDeleteMixin, admin.ModelAdmin):
+    list_display = ['title', 'course', 'order']
+    list_filter = ['course__subject']
+    list_select_related = ['course']
+    list_per_page = 50
+    search_fields = ['title', 'course__title']
+    raw_id_fields = ['course']
+    ordering = ['course', 'order']
+    action_form = ModuleActionForm
+    actions = ['move_modules', 'renumber_modules', 'delete_modules']
+    delete_actions = ['delete_modules']
+
+    def move_modules(self, request, queryset):
+        """
+        Append the selected modules to the course given in the action form,
+        keeping their relative order, with one UPDATE.
+        """
+        try:
+            course = Course.objects.get(id=request.POST.get('course'))
+        except (Course.DoesNotExist, ValueError):
+            self.message_user(request, 'Enter the id of an existing course.', messages.ERROR)
+            return
+        ids = list(queryset.order_by('course', 'order').values_list('id', flat=True))
+        source_ids = set(queryset.values_list('course_id', flat=True))
+        with transaction.atomic():
+            last = course.modules.exclude(id__in=ids).aggregate(last=Max('order'))['last']
+            first = 0 if last is None else last + 1
+            Module.objects.filter(id__in=ids).update(
+                course=course, order=self.positions(ids, first))
+            # updates send no signals, refresh the snapshot ourselves
+            course_modules_changed(*(source_ids | {course.id}))
+        self.message_user(request, '{} modules moved to "{}".'.format(len(ids), course))
+    move_modules.short_description = 'Move selected modules to course'
+
+    def renumber_modules(self, request, queryset):
+        """
+        Renumber all modules of the affected courses 0, 1, 2... keeping their
+        current order, one UPDATE per course.
+        """
+        course_ids = set(queryset.values_list('course_id', flat=True))
+        with transaction.atomic():
+            for course_id in course_ids:
+                ids = list(Module.objects.filter(course_id=course_id)
+                           .order_by('order', 'id').values_list('id', flat=True))
+                Module.objects.filter(id__in=ids).update(order=self.positions(ids))
+            # module numbers appear on the course detail page
+            course_modules_changed(*course_ids)
+        self.message_user(request, 'Renumbered the modules of {} courses.'.format(len(course_ids)))
+    renumber_modules.short_description = 'Renumber modules of their courses'
+
+    def delete_modules(self, request, queryset):
+        """
+        Delete the selected modules together with their contents and items,
+        one DELETE per table instead of one per object.
+        """
+        self.check_delete_permission(request)
+        ids = list(queryset.values_list('id', flat=True))
+        with transaction.atomic():
+            contents = Content.objects.filter(module_id__in=ids)
+            delete_items(contents)
+            contents.delete()
+            Module.objects.filter(id__in=ids).delete()
+        self.message_user(request, '{} modules deleted.'.format(len(ids)))
+    delete_modules.short_description = 'Delete selected modules and their contents'
+
+    @staticmethod
+    def positions(ids, first=0):
+        return Case(*[When(id=id, then=Value(position))
+                      for position, id in enumerate(ids, first)],
+                    output_field=IntegerField())
+
+
+@admin.register(Content)
+class ContentAdmin(BulkDeleteMixin, admin.ModelAdmin):
+    list_display = ['id', 'module', 'content_type', 'object_id', 'order']
+    list_filter = ['content_type']
+    list_select_related = ['module', 'content_type']
+    raw_id_fields = ['module']
+    ordering = ['module', 'order']
+
+    actions = ['delete_contents']
+    delete_actions = ['delete_contents']
+
+    def delete_contents(self, request, queryset):
+        self.check_delete_permission(request)
+        ids = list(queryset.values_list('id', flat=True))
+        with transaction.atomic():
+            contents = Content.objects.filter(id__in=ids)
+            delete_items(contents)
+            contents.delete()
+        self.message_user(request, '{} contents deleted.'.format(len(ids)))
+    delete_contents.short_description = 'Delete selected contents and their items'
+
+
+class ItemAdmin(admin.ModelAdmin):
+    list_display = ['title', 'owner', 'created', 'updated']
+    list_select_related = ['owner']
+    list_filter = ['created']
+    search_fields = ['title']
+    raw_id_fields = ['owner']
+    date_hierarchy = 'created'
+
+
+admin.site.register(Text, ItemAdmin)
+admin.site.register(File, ItemAdmin)
+admin.site.register(Image, ItemAdmin)
+
+
+@admin.register(Video)
+class VideoAdmin(ItemAdmin):
+    list_display = ['title', 'owner', 'provider', 'duration', 'resolved']
+    list_filter = ['provider', 'created']
@@ -16,5 +16,8 @@ urlpatterns = [
         url(r'^courses/(?P<pk>\d+)/enroll/$',views.CourseEnrollView.as_view(),
             name='course_enroll'),
 
+        url(r'^students/import/$',views.StudentImportView.as_view(),
+            name='student_import'),
+
         url(r'^', include(router.urls)),
 ]
@@ -3,11 +3,13 @@ from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authentication import BasicAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import detail_route
+from rest_framework.parsers import MultiPartParser
 
 from ..models import Subject, Course
 from .serializers import SubjectSerializer, CourseSerializer
+from students.importer import queue_import
 
 
 class SubjectListView(generics.ListAPIView):
@@ -39,5 +41,32 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     def enroll(self, request, *args, **kwargs):
         course = self.get_object()
         course.students.add(request.user)
+        return Response({'enrolled': True})
+
+
+class StudentImportView(APIView):
+    """
+    Create students from an uploaded CSV file and enroll them in the
+    courses given as repeated course fields. The import runs in the
+    background, see students.importer.queue_import().
+    """
+    authentication_classes = (BasicAuthentication,)
+    permission_classes = (IsAdminUser,)
+    parser_classes = (MultiPartParser,)
 
-    return Response({'enrolled': True})
+    def post(self, request, format=None):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded.'}, status=400)
+        try:
+            course_ids = [int(id) for id in request.data.getlist('course')]
+        except ValueError:
+            return Response({'error': 'Course ids must be integers.'}, status=400)
+        courses = list(Course.objects.filter(id__in=course_ids).values_list('id', flat=True))
+        if len(courses) != len(set(course_ids)):
+            return Response({'error': 'Unknown course.'}, status=400)
+        header = upload.file.readline().decode('utf-8', 'replace')
+        if 'username' not in [column.strip() for column in header.split(',')]:
+            return Response({'error': 'Expected a CSV file with a username column.'}, status=400)
+        name = queue_import(upload, courses)
+        return Response({'queued': name}, status=202)
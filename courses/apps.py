@@ -5,3 +5,8 @@ from django.apps import AppConfig
 
 class CoursesConfig(AppConfig):
     name = 'courses'
+
+    def ready(self):
+        # keep the pre-rendered catalog in step with course changes
+        from . import snapshot
+        snapshot.connect_signals()
@@ -0,0 +1,64 @@
+"""
+Run code once the current transaction has committed.
+
+transaction.on_commit() only exists from Django 1.9 on and is used there.
+On older versions a callback registered inside an atomic block is kept on
+the connection, whose commit() and rollback() are wrapped until the
+outermost atomic block ends: committing runs the callbacks, rolling back
+drops them. This covers the atomic blocks Django opens itself, e.g. in
+Model.delete(), in requests, management commands and tests alike. A
+callback registered outside a transaction runs right away.
+
+Unlike Django 1.9, rolling back to a savepoint keeps the callbacks
+registered after it; ours all re-check the database when they run.
+"""
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def on_commit(func):
+    native = getattr(transaction, 'on_commit', None)
+    if native is not None:
+        native(func)
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        func()
+        return
+    if not hasattr(connection, 'commit_callbacks'):
+        hook(connection)
+    connection.commit_callbacks.append(func)
+
+
+def hook(connection):
+    commit, rollback = connection.commit, connection.rollback
+
+    def unhook():
+        callbacks = connection.commit_callbacks
+        # the instance attributes shadow the methods, deleting them restores those
+        del connection.commit_callbacks, connection.commit, connection.rollback
+        return callbacks
+
+    def commit_and_run():
+        commit()
+        callbacks = unhook()
+        if connection.commit_on_exit and not connection.in_atomic_block:
+            # Atomic.__exit__ only turns autocommit back on after commit()
+            # returns, callbacks opening atomic blocks of their own need it
+            connection.set_autocommit(True)
+        for func in callbacks:
+            try:
+                func()
+            except Exception:
+                logger.exception('Running %r after commit failed', func)
+
+    def rollback_and_drop():
+        rollback()
+        unhook()
+
+    connection.commit_callbacks = []
+    connection.commit = commit_and_run
+    connection.rollback = rollback_and_drop
@@ -1,8 +1,11 @@
 from django import forms
-from django.forms.models import inlineformset_factory
+from django.forms.models import inlineformset_factory, modelform_factory
 from .models import Course, Module
 
 ModuleFormSet = inlineformset_factory(Course, Module,
                                       fields=['title', 'description'],
                                       extra=2,
                                       can_delete=True)
+
+# validates a single module of an incremental edit, see CourseModuleDiffView
+ModuleForm = modelform_factory(Module, fields=['title', 'description'])
@@ -0,0 +1,35 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from courses import snapshot
+
+
+class Command(BaseCommand):
+    help = 'Render the public catalog and every course detail page to SNAPSHOT_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Rendering processes, defaults to the CPU count.')
+
+    def handle(self, *args, **options):
+        if not snapshot.snapshot_root():
+            raise CommandError('Set SNAPSHOT_ROOT to build a snapshot.')
+        started = time.time()
+        snapshot.clear_catalog_cache()
+        paths = snapshot.all_paths()
+        # every process opens its own database and cache connections
+        connections.close_all()
+        for cache in caches.all():
+            cache.close()
+        processes = options['processes'] or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            written = sum(pool.map(snapshot.write_path, paths, chunksize=chunksize))
+        snapshot.remove_stale_files(paths)
+        self.stdout.write('Wrote {} of {} pages in {:.1f}s'.format(
+            written, len(paths), time.time() - started))
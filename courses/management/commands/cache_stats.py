@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = 'Render pages through the cache and report how well they compress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/'],
+                            help='Pages to request, defaults to the catalog.')
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'compression_stats'):
+            raise CommandError('The default cache does not compress values, '
+                               'use educa.cache.CompressedMemcachedCache.')
+        client = Client(HTTP_HOST='localhost', HTTP_ACCEPT_ENCODING='gzip')
+        for path in options['paths']:
+            # a second request is served from the cache
+            for i in range(2):
+                response = client.get(path)
+            self.stdout.write('{} {} {} bytes{}'.format(
+                path, response.status_code, len(response.content),
+                ' (gzip)' if response.has_header('Content-Encoding') else ''))
+
+        stats = cache.compression_stats.as_dict()
+        self.stdout.write('values stored: {values}, compressed: {compressed}'.format(**stats))
+        self.stdout.write('raw bytes: {raw_bytes}, stored bytes: {stored_bytes}, '
+                          'ratio: {ratio:.2f}x'.format(**stats))
+
+        for server, server_stats in cache.server_stats():
+            items = int(server_stats.get('curr_items', 0))
+            used = int(server_stats.get('bytes', 0))
+            limit = int(server_stats.get('limit_maxbytes', 0))
+            # the same items stored uncompressed would need ratio times the
+            # memory, so that many more of them now fit in the cache
+            gained = int(items * (stats['ratio'] - 1))
+            self.stdout.write('{}: {} items in {} of {} bytes, '
+                              '~{} extra items fit thanks to compression'.format(
+                                  server, items, used, limit, gained))
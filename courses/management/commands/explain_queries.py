@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from courses.queryplans import HOT_QUERIES, analyze, explain
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the registered hot queries and flag those that scan whole tables or sort.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='Refresh the planner statistics first.')
+        parser.add_argument('--fail', action='store_true',
+                            help='Exit with an error when a query is flagged.')
+
+    def handle(self, *args, **options):
+        if not Course.objects.exists():
+            raise CommandError('The database has no courses, run seed_data first.')
+        if options['analyze']:
+            analyze()
+
+        flagged = []
+        for name, (build, scan_expected, sort_expected) in HOT_QUERIES.items():
+            lines, scans, sorts = explain(build())
+            self.stdout.write(name)
+            for line in lines:
+                self.stdout.write('    {}'.format(line))
+            if scans and not scan_expected:
+                self.stdout.write('    FULL SCAN: {}'.format('; '.join(scans)))
+            if sorts and not sort_expected:
+                self.stdout.write('    SORT: {}'.format('; '.join(sorts)))
+            if (scans and not scan_expected) or (sorts and not sort_expected):
+                flagged.append(name)
+
+        self.stdout.write('{} of {} queries read whole tables or sort{}'.format(
+            len(flagged), len(HOT_QUERIES),
+            ': ' + ', '.join(flagged) if flagged else ''))
+        if flagged and options['fail']:
+            raise CommandError('{} hot queries use full scans or sorts'.format(len(flagged)))
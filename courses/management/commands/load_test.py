@@ -0,0 +1,170 @@
+import bisect
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Subject, Course
+
+DEFAULT_MIX = 'catalog=40,detail=30,student=20,api=10'
+
+
+def parse_mix(value):
+    mix = []
+    for part in value.split(','):
+        kind, weight = part.split('=')
+        mix.append((kind.strip(), float(weight)))
+    return mix
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = ('Replay a mix of catalog, course detail, student and API requests '
+            'against the WSGI application and report throughput and latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Relative weights, e.g. "{}".'.format(DEFAULT_MIX))
+        parser.add_argument('--sessions', type=int, default=50,
+                            help='Logged in students to spread student requests over.')
+        parser.add_argument('--sample', type=int, default=1000,
+                            help='Courses and subjects to pick URLs from.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        # imported here so the command only builds the app when it runs
+        from educa.wsgi import application
+        self.application = application
+        self.random = random.Random(options['seed'])
+
+        mix = parse_mix(options['mix'])
+        unknown = [kind for kind, weight in mix if not hasattr(self, 'path_' + kind)]
+        if unknown:
+            raise CommandError('Unknown request kinds: {}'.format(', '.join(unknown)))
+
+        self.subjects = list(Subject.objects.values_list('slug', flat=True)[:options['sample']])
+        self.courses = list(Course.objects.values_list('id', 'slug')[:options['sample']])
+        if not self.courses:
+            raise CommandError('No courses found, run seed_data first.')
+        self.sessions = self.student_sessions(options['sessions'])
+
+        kinds = [kind for kind, weight in mix]
+        cumulative = []
+        total = 0
+        for kind, weight in mix:
+            total += weight
+            cumulative.append(total)
+        plan = [kinds[bisect.bisect(cumulative, self.random.random() * total)]
+                for i in range(options['requests'])]
+        requests = [(kind, ) + getattr(self, 'path_' + kind)() for kind in plan]
+
+        self.results = []
+        self.lock = threading.Lock()
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(lambda request: self.run_request(*request), requests))
+        elapsed = time.time() - started
+        self.report(elapsed, options['threads'])
+
+    def student_sessions(self, count):
+        """
+        Session cookies for enrolled students, created directly in the
+        session store so no password hashing happens during the run.
+        """
+        students = User.objects.filter(courses_joined__isnull=False).distinct()[:count]
+        sessions = []
+        for user in students:
+            course_ids = list(user.courses_joined.values_list('id', flat=True)[:20])
+            session = SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            sessions.append((session.session_key, course_ids))
+        return sessions
+
+    def path_catalog(self):
+        if self.subjects and self.random.random() < 0.5:
+            return '/course/subject/{}/'.format(self.random.choice(self.subjects)), None
+        return '/', None
+
+    def path_detail(self):
+        course_id, slug = self.random.choice(self.courses)
+        return '/course/{}/'.format(slug), None
+
+    def path_student(self):
+        if not self.sessions:
+            return self.path_catalog()
+        session_key, course_ids = self.random.choice(self.sessions)
+        if course_ids and self.random.random() < 0.7:
+            path = '/students/course/{}/'.format(self.random.choice(course_ids))
+        else:
+            path = '/students/courses/'
+        return path, session_key
+
+    def path_api(self):
+        course_id, slug = self.random.choice(self.courses)
+        return self.random.choice(['/api/subjects/', '/api/courses/',
+                                   '/api/courses/{}/'.format(course_id)]), None
+
+    def run_request(self, kind, path, session_key):
+        environ = {}
+        setup_testing_defaults(environ)
+        environ.update({
+            'PATH_INFO': path,
+            'REQUEST_METHOD': 'GET',
+            'HTTP_HOST': 'localhost',
+            'SERVER_NAME': 'localhost',
+            'HTTP_ACCEPT_ENCODING': 'gzip',
+            'wsgi.input': BytesIO(),
+        })
+        if session_key:
+            environ['HTTP_COOKIE'] = '{}={}'.format(settings.SESSION_COOKIE_NAME, session_key)
+        status = []
+
+        def start_response(response_status, headers, exc_info=None):
+            status.append(int(response_status.split()[0]))
+
+        started = time.time()
+        result = self.application(environ, start_response)
+        try:
+            size = sum(len(chunk) for chunk in result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        latency = time.time() - started
+        with self.lock:
+            self.results.append((kind, status[0], latency, size))
+
+    def report(self, elapsed, threads):
+        self.stdout.write('{} requests in {:.2f}s with {} threads: {:.1f} req/s'.format(
+            len(self.results), elapsed, threads, len(self.results) / elapsed))
+        rows = [('all', self.results)]
+        for kind in sorted(set(r[0] for r in self.results)):
+            rows.append((kind, [r for r in self.results if r[0] == kind]))
+        self.stdout.write('{:<10}{:>8}{:>8}{:>10}{:>10}{:>10}{:>10}{:>10}'.format(
+            'kind', 'count', 'errors', 'p50 ms', 'p90 ms', 'p95 ms', 'p99 ms', 'max ms'))
+        for kind, results in rows:
+            latencies = sorted(r[2] * 1000 for r in results)
+            errors = len([r for r in results if r[1] >= 400])
+            self.stdout.write('{:<10}{:>8}{:>8}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+                kind, len(results), errors,
+                percentile(latencies, 50), percentile(latencies, 90),
+                percentile(latencies, 95), percentile(latencies, 99),
+                latencies[-1] if latencies else 0.0))
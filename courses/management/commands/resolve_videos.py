@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Video
+from courses.video import update_video
+
+
+class Command(BaseCommand):
+    help = 'Resolve metadata for videos saved before it was stored, or all of them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Resolve every video again, not only unresolved ones.')
+
+    def handle(self, *args, **options):
+        videos = Video.objects.all()
+        if not options['all']:
+            videos = videos.filter(resolved__isnull=True)
+        count = 0
+        for pk, url in videos.values_list('pk', 'url'):
+            update_video(Video, pk, url)
+            count += 1
+        self.stdout.write('Resolved {} videos'.format(count))
@@ -0,0 +1,205 @@
+import json
+import os
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models import Max
+
+from courses.models import Subject, Course, Module, Content, Text, Video, Image, File
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))), 'fixtures', 'subjects.json')
+
+VIDEO_URLS = [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://vimeo.com/76979871',
+]
+
+LOREM = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua. ')
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def new_ids(model, last_id):
+    """
+    Primary keys created after last_id. bulk_create() does not return them
+    on every backend, and seeding is the only writer while it runs.
+    """
+    return list(model.objects.filter(id__gt=last_id)
+                .order_by('id').values_list('id', flat=True))
+
+
+def last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic users, courses, contents and enrollments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--instructors', type=int, default=100)
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument('--modules', type=int, default=10,
+                            help='Modules per course.')
+        parser.add_argument('--contents', type=int, default=4,
+                            help='Contents per module.')
+        parser.add_argument('--enrollments', type=int, default=5,
+                            help='Courses each student joins.')
+        parser.add_argument('--password', default='educa-seed',
+                            help='Password shared by every seeded user.')
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Random seed, for reproducible data sets.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        subject_ids = self.seed_subjects()
+        # hashing is expensive, every seeded user shares the same hash
+        password = make_password(options['password'])
+        instructor_ids = self.seed_users('{}_instructor'.format(prefix),
+                                         options['instructors'], password)
+        student_ids = self.seed_users('{}_student'.format(prefix),
+                                      options['students'], password)
+
+        course_ids = self.seed_courses(prefix, options['courses'],
+                                       instructor_ids, subject_ids)
+        self.stdout.write('{} courses'.format(len(course_ids)))
+
+        owners = dict(Course.objects.filter(id__in=course_ids)
+                      .values_list('id', 'owner_id'))
+        # keep every transaction around batch_size modules
+        per_chunk = max(1, self.batch_size // max(1, options['modules']))
+        modules = contents = 0
+        for course_chunk in chunks(course_ids, per_chunk):
+            with transaction.atomic():
+                module_ids = self.seed_modules(course_chunk, options['modules'])
+                contents += self.seed_contents(module_ids, options['contents'], owners)
+            modules += len(module_ids)
+        self.stdout.write('{} modules, {} contents'.format(modules, contents))
+
+        enrollments = self.seed_enrollments(student_ids, course_ids,
+                                            options['enrollments'])
+        self.stdout.write('{} enrollments'.format(enrollments))
+
+    def bulk_create(self, model, objs):
+        """
+        bulk_create() with --batch-size capped at what the database takes in
+        one statement. Django 1.8 uses an explicit batch_size as given, and
+        SQLite allows 500 rows per multi-row INSERT at most.
+        """
+        objs = list(objs)
+        if not objs:
+            return
+        fields = [field for field in model._meta.concrete_fields
+                  if not isinstance(field, models.AutoField)]
+        batch_size = min(self.batch_size, connection.ops.bulk_batch_size(fields, objs))
+        model.objects.bulk_create(objs, batch_size=max(1, batch_size))
+
+    def seed_subjects(self):
+        with open(FIXTURE) as fixture:
+            subjects = [obj['fields'] for obj in json.load(fixture)
+                        if obj['model'] == 'courses.subject']
+        existing = set(Subject.objects.values_list('slug', flat=True))
+        Subject.objects.bulk_create([Subject(title=s['title'], slug=s['slug'])
+                                     for s in subjects if s['slug'] not in existing])
+        return list(Subject.objects.values_list('id', flat=True))
+
+    def seed_users(self, prefix, count, password):
+        start = User.objects.filter(username__startswith=prefix + '_').count()
+        before = last_id(User)
+        users = (User(username='{}_{}'.format(prefix, n),
+                      first_name=prefix.split('_')[-1].title(),
+                      last_name=str(n),
+                      email='{}_{}@example.com'.format(prefix, n),
+                      password=password)
+                 for n in range(start, start + count))
+        with transaction.atomic():
+            self.bulk_create(User, users)
+        ids = new_ids(User, before)
+        self.stdout.write('{} {} users'.format(len(ids), prefix))
+        return ids
+
+    def seed_courses(self, prefix, count, instructor_ids, subject_ids):
+        start = Course.objects.filter(slug__startswith=prefix + '-course-').count()
+        before = last_id(Course)
+        courses = (Course(owner_id=self.random.choice(instructor_ids),
+                          subject_id=self.random.choice(subject_ids),
+                          title='Course {}'.format(n),
+                          slug='{}-course-{}'.format(prefix, n),
+                          overview=LOREM * 3)
+                   for n in range(start, start + count))
+        with transaction.atomic():
+            self.bulk_create(Course, courses)
+        return new_ids(Course, before)
+
+    def seed_modules(self, course_ids, per_course):
+        before = last_id(Module)
+        # explicit order values, OrderField would query for each one
+        self.bulk_create(Module,
+            [Module(course_id=course_id,
+                    title='Module {}'.format(order + 1),
+                    description=LOREM,
+                    order=order)
+             for course_id in course_ids for order in range(per_course)])
+        return new_ids(Module, before)
+
+    def seed_contents(self, module_ids, per_module, owners):
+        owner_of = dict(Module.objects.filter(id__in=module_ids)
+                        .values_list('id', 'course_id'))
+        item_models = [Text, Video, Image, File]
+        # (module_id, order, item model), then the items of each model are
+        # created in one bulk insert and matched back by position
+        plan = [(module_id, order, self.random.choice(item_models))
+                for module_id in module_ids for order in range(per_module)]
+        item_ids = {}
+        for model in item_models:
+            wanted = [owners[owner_of[module_id]]
+                      for module_id, order, m in plan if m is model]
+            before = last_id(model)
+            self.bulk_create(model, [self.build_item(model, owner_id, n)
+                                     for n, owner_id in enumerate(wanted)])
+            item_ids[model] = iter(new_ids(model, before))
+
+        content_types = ContentType.objects.get_for_models(*item_models)
+        self.bulk_create(Content,
+            [Content(module_id=module_id,
+                     content_type=content_types[model],
+                     object_id=next(item_ids[model]),
+                     order=order)
+             for module_id, order, model in plan])
+        return len(plan)
+
+    def build_item(self, model, owner_id, n):
+        item = model(owner_id=owner_id, title='{} {}'.format(model._meta.verbose_name, n))
+        if model is Text:
+            item.content = LOREM * self.random.randint(1, 20)
+        elif model is Video:
+            item.url = self.random.choice(VIDEO_URLS)
+        elif model is Image:
+            item.file = 'images/seed.png'
+        else:
+            item.file = 'images/seed.pdf'
+        return item
+
+    def seed_enrollments(self, student_ids, course_ids, per_student):
+        Enrollment = Course.students.through
+        per_student = min(per_student, len(course_ids))
+        rows = (Enrollment(course_id=course_id, user_id=student_id)
+                for student_id in student_ids
+                for course_id in self.random.sample(course_ids, per_student))
+        with transaction.atomic():
+            self.bulk_create(Enrollment, rows)
+        return len(student_ids) * per_student
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import courses.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('references', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TextRevision',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('version', models.PositiveIntegerField()),
+                ('full', models.BooleanField(default=False)),
+                ('data', models.TextField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('-version',),
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='content',
+            options={'ordering': ['order']},
+        ),
+        migrations.AlterModelOptions(
+            name='course',
+            options={'ordering': ('-created',)},
+        ),
+        migrations.AlterModelOptions(
+            name='module',
+            options={'ordering': ['order']},
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='duration',
+            field=models.PositiveIntegerField(blank=True, null=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='embed_code',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='provider',
+            field=models.CharField(max_length=50, blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='resolved',
+            field=models.DateTimeField(blank=True, null=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='thumbnail',
+            field=models.URLField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='video_id',
+            field=models.CharField(max_length=100, blank=True, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='file',
+            field=models.FileField(upload_to='images', storage=courses.storage.ContentAddressedStorage()),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=models.FileField(upload_to='images', storage=courses.storage.ContentAddressedStorage()),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='text',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='textrevision',
+            name='text',
+            field=models.ForeignKey(related_name='revisions', to='courses.Text'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='textrevision',
+            unique_together=set([('text', 'version')]),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_items_metadata_and_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='content',
+            index_together=set([('module', 'order'), ('content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='course',
+            index_together=set([('subject', 'created')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='module',
+            index_together=set([('course', 'order')]),
+        ),
+    ]
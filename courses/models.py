@@ -1,13 +1,17 @@
 from __future__ import unicode_literals
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.db.models.signals import post_delete
 from django.template.loader import render_to_string
 from django.utils.safestring import mark_safe
 
 from .fields import OrderField
+from .video import schedule_resolution
+from .storage import blob_storage, claim_upload, retain_blob, release_blob
+from .revisions import make_delta, apply_delta, is_full_version
 
 # Create your models here.
 # Building the course models
@@ -44,8 +48,10 @@ class Course(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     students = models.ManyToManyField(User,related_name='courses_joined',blank=True)
 
-    class meta:
-        ordering = ('-created')
+    class Meta:
+        ordering = ('-created',)
+        # subject catalog pages, newest first
+        index_together = [('subject', 'created')]
 
     def __str__(self):
         return self.title
@@ -57,6 +63,11 @@ class Module(models.Model):
     description = models.TextField(blank=True)
     order = OrderField(for_fields=['course'])
 
+    class Meta:
+        ordering = ['order']
+        # a course's modules in order
+        index_together = [('course', 'order')]
+
     def __str__(self):
         return '{}. {}'.format(self.order, self.title)
 #    def __str__self(self):
@@ -66,7 +77,7 @@ class Module(models.Model):
 class Content(models.Model):
     module = models.ForeignKey(Module, related_name='contents')
     content_type = models.ForeignKey(ContentType, limit_choices_to={
-        'model_in': ('text',
+        'model__in': ('text',
                 'video',
                 'image',
                 'file',)
@@ -76,15 +87,18 @@ class Content(models.Model):
     item = GenericForeignKey('content_type', 'object_id')
     order = OrderField(for_fields=['module'])
 
-    class meta:
+    class Meta:
         ordering = ['order']
+        # a module's contents in order, and the reverse of the generic
+        # relation from an item to its Content
+        index_together = [('module', 'order'), ('content_type', 'object_id')]
 
 
 class ItemBase(models.Model):
     owner = models.ForeignKey(User, related_name='%(class)s_related')
     title = models.CharField(max_length=250)
     created = models.DateTimeField(auto_now_add=True)
-    updated = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
@@ -98,15 +112,159 @@ class ItemBase(models.Model):
 
 class Text(ItemBase):
     content = models.TextField()
+    # bumped on every change of content, use it in cache keys and ETags
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    @property
+    def etag(self):
+        return '"text-{}-{}"'.format(self.pk, self.version)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # lock the row so concurrent edits get consecutive versions
+                previous = Text.objects.select_for_update().filter(
+                    pk=self.pk).values_list('content', 'version').first()
+            if previous is None:
+                self.version = 1
+            elif previous[0] != self.content:
+                self.version = previous[1] + 1
+            else:
+                self.version = previous[1]
+                return super(Text, self).save(*args, **kwargs)
+            super(Text, self).save(*args, **kwargs)
+            full = (previous is None or is_full_version(self.version) or
+                    not self.revisions.filter(version=previous[1]).exists())
+            TextRevision.objects.create(
+                text=self,
+                version=self.version,
+                full=full,
+                data=self.content if full else make_delta(previous[0], self.content))
+
+    def get_version(self, version):
+        """
+        Return the content as it was at version, rebuilt from the closest
+        full copy and the deltas after it.
+        """
+        if version == self.version:
+            return self.content
+        start = self.revisions.filter(version__lte=version, full=True).order_by('-version').first()
+        if start is None:
+            raise TextRevision.DoesNotExist
+        content = start.data
+        for revision in self.revisions.filter(version__gt=start.version,
+                                              version__lte=version).order_by('version'):
+            content = apply_delta(content, revision.data)
+        return content
 
 
-class File(ItemBase):
-    file = models.FileField(upload_to='images')
+class TextRevision(models.Model):
+    text = models.ForeignKey(Text, related_name='revisions')
+    version = models.PositiveIntegerField()
+    # the whole content, or the delta from the previous version
+    full = models.BooleanField(default=False)
+    data = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('text', 'version')
+        ordering = ('-version',)
+
+
+class Blob(models.Model):
+    # a deduplicated upload in blob_storage and how many items use it
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class BlobFileMixin(object):
+    """
+    Keeps the Blob reference count of the file field in step with the item.
+    Deleting releases the blob through release_item_blob below, which also
+    runs for queryset and cascade deletes.
+    """
+    def __init__(self, *args, **kwargs):
+        super(BlobFileMixin, self).__init__(*args, **kwargs)
+        self._stored_file = self.file.name if self.pk else None
+
+    def save(self, *args, **kwargs):
+        # a new row holds no reference yet, also when copied from another
+        # item with pk = None, which leaves _state.adding False
+        adding = self._state.adding or self.pk is None
+        previous = None if adding else self._stored_file
+        super(BlobFileMixin, self).save(*args, **kwargs)
+        name = self.file.name or None
+        # a fresh upload already took a reference for us
+        claimed = bool(name) and claim_upload(name)
+        if name != previous:
+            if name and not claimed:
+                retain_blob(name)
+            if previous:
+                release_blob(previous)
+        elif claimed:
+            # the same content uploaded again, we already hold a reference
+            release_blob(name)
+        self._stored_file = name
+
+
+class File(BlobFileMixin, ItemBase):
+    file = models.FileField(upload_to='images', storage=blob_storage)
 
 
 class Video(ItemBase):
     url = models.URLField()
+    # filled in from url by courses.video, rendering only uses these
+    provider = models.CharField(max_length=50, blank=True, editable=False)
+    video_id = models.CharField(max_length=100, blank=True, editable=False)
+    embed_code = models.TextField(blank=True, editable=False)
+    thumbnail = models.URLField(blank=True, editable=False)
+    duration = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    resolved = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def __init__(self, *args, **kwargs):
+        super(Video, self).__init__(*args, **kwargs)
+        self._resolved_url = self.url if self.pk else None
+
+    def save(self, *args, **kwargs):
+        url_changed = self.url != self._resolved_url
+        if url_changed:
+            # drop stale metadata until the new url is resolved
+            self.provider = self.video_id = self.embed_code = self.thumbnail = ''
+            self.duration = self.resolved = None
+        super(Video, self).save(*args, **kwargs)
+        if url_changed:
+            self._resolved_url = self.url
+            schedule_resolution(self)
 
 
-class Image(ItemBase):
-    file = models.FileField(upload_to='images')
+class Image(BlobFileMixin, ItemBase):
+    file = models.FileField(upload_to='images', storage=blob_storage)
+
+
+def release_item_blob(sender, instance, **kwargs):
+    if instance.file.name:
+        release_blob(instance.file.name)
+
+post_delete.connect(release_item_blob, sender=File)
+post_delete.connect(release_item_blob, sender=Image)
+
+
+def delete_items(contents):
+    """
+    Delete the Text, Video, Image and File items behind contents, grouped
+    by content type, before contents themselves are deleted. Deleting a
+    Content or its Module only cascades to the Content row, the generic
+    relation would leave the item behind.
+    """
+    by_type = {}
+    for content_type_id, object_id in contents.values_list('content_type_id', 'object_id'):
+        by_type.setdefault(content_type_id, []).append(object_id)
+    content_types = ContentType.objects.get_for_models(Text, Video, Image, File)
+    for model, content_type in content_types.items():
+        object_ids = by_type.get(content_type.id)
+        if object_ids:
+            model.objects.filter(id__in=object_ids).delete()
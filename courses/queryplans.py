@@ -0,0 +1,140 @@
+"""
+The hot queries of courses.views, students.views and courses.api.views,
+registered so explain_queries can check their plans against a seeded
+database (see seed_data).
+
+Each entry builds the queryset with sample values taken from the database.
+Queries that read a whole table by design, like the full catalog, are
+registered with scan_expected=True, and those that sort a handful of rows
+the index can not return in order with sort_expected=True; neither is
+flagged.
+"""
+from collections import OrderedDict
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+
+from .models import Subject, Course, Module, Content, Text
+from .views import module_counts
+
+HOT_QUERIES = OrderedDict()
+
+
+def hot_query(name, scan_expected=False, sort_expected=False):
+    def register(function):
+        HOT_QUERIES[name] = (function, scan_expected, sort_expected)
+        return function
+    return register
+
+
+def sample(model, **filters):
+    return model.objects.filter(**filters).order_by('pk').first()
+
+
+@hot_query('catalog: all courses', scan_expected=True, sort_expected=True)
+def all_courses():
+    return Course.objects.all()
+
+
+@hot_query('catalog: courses of a subject')
+def subject_courses():
+    return Course.objects.filter(subject=sample(Subject))
+
+
+@hot_query('catalog: module counts of a subject\'s courses')
+def subject_module_counts():
+    return module_counts(subject_courses())
+
+
+@hot_query('course detail by slug')
+def course_detail():
+    return Course.objects.filter(slug=sample(Course).slug)
+
+
+# an instructor has a few courses, sorting them is cheap
+@hot_query('instructor: own courses', sort_expected=True)
+def owner_courses():
+    return Course.objects.filter(owner_id=sample(Course).owner_id)
+
+
+@hot_query('course modules in order')
+def course_modules():
+    return Module.objects.filter(course=sample(Course))
+
+
+@hot_query('module contents in order')
+def module_contents():
+    return Content.objects.filter(module=sample(Module))
+
+
+@hot_query('content of an item (generic relation)', sort_expected=True)
+def item_content():
+    text = sample(Text)
+    return Content.objects.filter(content_type=ContentType.objects.get_for_model(Text),
+                                  object_id=text.id if text else 0)
+
+
+@hot_query('student: joined courses', sort_expected=True)
+def student_courses():
+    return Course.objects.filter(students__in=[sample(User, courses_joined__isnull=False)])
+
+
+@hot_query('student: enrollment check')
+def enrollment_check():
+    course = sample(Course)
+    return course.students.filter(id=sample(User).id)
+
+
+@hot_query('api: course with modules', scan_expected=True, sort_expected=True)
+def api_courses():
+    return Course.objects.prefetch_related('modules')
+
+
+def explain(queryset):
+    """
+    Return the plan of queryset as a list of lines, the lines that read a
+    whole table and the lines that sort rows an index did not return in
+    order.
+    """
+    sql, params = queryset.query.sql_with_params()
+    vendor = connection.vendor
+    prefix = 'EXPLAIN QUERY PLAN ' if vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        columns = [column[0].lower() for column in cursor.description]
+        rows = cursor.fetchall()
+
+    if vendor == 'sqlite':
+        # (id, parent, notused, detail), e.g. "SCAN TABLE courses_course"
+        lines = [row[-1] for row in rows]
+        scans = [line for line in lines
+                 if line.startswith('SCAN') and 'INDEX' not in line]
+        sorts = [line for line in lines if line.startswith('USE TEMP B-TREE FOR ORDER BY')]
+    elif vendor == 'mysql':
+        lines = [' '.join(str(value) for value in row) for row in rows]
+        type_column = columns.index('type')
+        extra_column = columns.index('extra')
+        scans = [line for line, row in zip(lines, rows) if row[type_column] == 'ALL']
+        sorts = [line for line, row in zip(lines, rows)
+                 if 'Using filesort' in (row[extra_column] or '')]
+    else:
+        lines = [row[0] for row in rows]
+        scans = [line for line in lines if 'Seq Scan' in line]
+        sorts = [line for line in lines if line.lstrip(' ->').startswith('Sort ')]
+    return lines, scans, sorts
+
+
+def analyze():
+    """
+    Refresh the planner statistics of every table.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            tables = connection.introspection.table_names(cursor)
+            cursor.execute('ANALYZE TABLE ' + ', '.join(
+                connection.ops.quote_name(table) for table in tables))
+            # MySQL reports per table in a result set of its own
+            cursor.fetchall()
+        else:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,57 @@
+"""
+Line based deltas for Text revision history.
+
+A delta turns one version of a text into the next and is stored as compact
+JSON, a list of operations applied in order to the old text's lines:
+
+    3               copy the next 3 lines of the old text
+    -2              skip the next 2 lines of the old text
+    ["a\\n", "b\\n"]  insert these lines
+
+so its size follows the size of the edit, not of the document. Every
+FULL_EVERY versions the whole text is stored instead, which bounds how many
+deltas have to be applied to rebuild an old version.
+
+Deltas only pay off for text spread over many lines. Content kept on a
+single line, e.g. HTML without line breaks, changes as one line on any
+edit, so each delta holds the whole new text like a full copy would.
+"""
+import json
+from difflib import SequenceMatcher
+
+FULL_EVERY = 20
+
+
+def make_delta(old, new):
+    old_lines = old.splitlines(True)
+    new_lines = new.splitlines(True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(-(i2 - i1))
+        if j2 > j1:
+            ops.append(new_lines[j1:j2])
+    return json.dumps(ops, separators=(',', ':'))
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(True)
+    position = 0
+    lines = []
+    for op in json.loads(delta):
+        if isinstance(op, list):
+            lines.extend(op)
+        elif op >= 0:
+            lines.extend(old_lines[position:position + op])
+            position += op
+        else:
+            position -= op
+    return ''.join(lines)
+
+
+def is_full_version(version):
+    return (version - 1) % FULL_EVERY == 0
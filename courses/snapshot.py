@@ -0,0 +1,250 @@
+"""
+Pre-rendered snapshot of the public catalog.
+
+The catalog and course detail pages look the same to every anonymous
+visitor, so we render them to files under SNAPSHOT_ROOT, one index.html per
+URL:
+
+    SNAPSHOT_ROOT/index.html                          /
+    SNAPSHOT_ROOT/course/subject/<slug>/index.html    /course/subject/<slug>/
+    SNAPSHOT_ROOT/course/<slug>/index.html            /course/<slug>/
+
+The front web server answers anonymous GET requests from these files and
+passes everything else (requests carrying a session cookie, missing files)
+to Django. With nginx:
+
+    location / {
+        if ($cookie_sessionid) { proxy_pass http://educa; break; }
+        try_files /snapshot$uri/index.html @educa;
+    }
+
+Saving or deleting a course, module or subject re-renders only the pages
+showing it, in the background once the transaction commits (see
+courses.commit). The build_snapshot command rebuilds everything with a
+pool of processes.
+Snapshots are disabled while SNAPSHOT_ROOT is not set.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.urlresolvers import resolve, reverse
+from django.db import connection
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from .commit import on_commit
+from .models import Subject, Course, Module
+
+logger = logging.getLogger(__name__)
+
+# a single worker keeps incremental updates in the order they happened
+_refresher = ThreadPoolExecutor(max_workers=1)
+
+# what the current thread's transaction has queued, see schedule_refresh()
+_local = threading.local()
+
+
+def snapshot_root():
+    return getattr(settings, 'SNAPSHOT_ROOT', None)
+
+
+def file_for_path(path):
+    return os.path.join(snapshot_root(), path.strip('/'), 'index.html')
+
+
+def render_path(path):
+    """
+    Render path as an anonymous visitor would see it, without going through
+    the middleware so the cached page is not served back to us.
+    """
+    # django.test pulls in the test runner, keep it out of startup
+    from django.test import RequestFactory
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def write_path(path):
+    response = render_path(path)
+    if response.status_code != 200:
+        logger.warning('Not writing snapshot of %s, got %s', path, response.status_code)
+        remove_path(path)
+        return False
+    filename = file_for_path(path)
+    directory = os.path.dirname(filename)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # write next to the target and rename, the web server never sees a
+    # partially written page
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(response.content)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, filename)
+    return True
+
+
+def remove_path(path):
+    filename = file_for_path(path)
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+def catalog_paths():
+    return [reverse('course_list')] + [
+        reverse('course_list_subject', args=[slug])
+        for slug in Subject.objects.values_list('slug', flat=True)]
+
+
+def course_paths():
+    return [reverse('course_detail', args=[slug])
+            for slug in Course.objects.values_list('slug', flat=True)]
+
+
+def all_paths():
+    return catalog_paths() + course_paths()
+
+
+def clear_catalog_cache():
+    # CourseListView caches its querysets, see courses.views
+    keys = ['all_subjects', 'all_courses']
+    keys += ['subject_{}_courses'.format(id)
+             for id in Subject.objects.values_list('id', flat=True)]
+    cache.delete_many(keys)
+
+
+def refresh(paths=(), removed=(), course_ids=(), catalog=False):
+    """
+    Re-render paths, the catalog pages if catalog is set and the catalog
+    and detail pages of the courses course_ids, then delete the files of
+    the removed paths that were not rendered again.
+    """
+    try:
+        paths = set(paths)
+        if catalog:
+            paths.update(catalog_paths())
+        if course_ids:
+            # module counts appear in the course lists and on the detail page
+            paths.add(reverse('course_list'))
+            courses = Course.objects.filter(id__in=course_ids).values_list('slug', 'subject__slug')
+            for slug, subject_slug in courses:
+                paths.add(reverse('course_list_subject', args=[subject_slug]))
+                paths.add(reverse('course_detail', args=[slug]))
+        clear_catalog_cache()
+        for path in set(removed) - paths:
+            remove_path(path)
+        for path in sorted(paths):
+            write_path(path)
+    except Exception:
+        logger.exception('Refreshing the catalog snapshot failed')
+    finally:
+        connection.close()
+
+
+def schedule_refresh(paths=(), removed=(), course_ids=(), catalog=False):
+    """
+    Queue a refresh, see refresh(). Everything the current thread queues
+    until its transaction commits is rendered once, so saving a formset of
+    20 modules of one course renders that course's pages once, not 20 times.
+    """
+    if not snapshot_root():
+        return
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = {'paths': set(), 'removed': set(),
+                                    'course_ids': set(), 'catalog': False}
+    pending['paths'].update(paths)
+    pending['removed'].update(removed)
+    pending['course_ids'].update(course_ids)
+    pending['catalog'] = pending['catalog'] or catalog
+    # later calls find nothing left to submit
+    on_commit(submit_pending)
+
+
+def submit_pending():
+    pending = getattr(_local, 'pending', None)
+    _local.pending = None
+    if pending is not None:
+        _refresher.submit(refresh, **pending)
+
+
+def remember_slug(sender, instance, raw=False, **kwargs):
+    # the page under the old slug has to go when the slug changes
+    instance._snapshot_slug = None
+    if instance.pk is not None and not raw:
+        instance._snapshot_slug = sender.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+def renamed(instance, url_name):
+    previous = getattr(instance, '_snapshot_slug', None)
+    if previous and previous != instance.slug:
+        return [reverse(url_name, args=[previous])]
+    return []
+
+
+def course_changed(sender, instance, **kwargs):
+    detail = reverse('course_detail', args=[instance.slug])
+    # adding or removing a course changes the counts in every subject list
+    if kwargs.get('signal') is post_delete:
+        schedule_refresh(removed=[detail], catalog=True)
+    else:
+        schedule_refresh([detail], removed=renamed(instance, 'course_detail'), catalog=True)
+
+
+def course_modules_changed(*course_ids):
+    schedule_refresh(course_ids=course_ids)
+
+
+def module_changed(sender, instance, **kwargs):
+    # a module deleted together with its course leaves nothing to render,
+    # refresh() skips courses that no longer exist
+    course_modules_changed(instance.course_id)
+
+
+def subject_changed(sender, instance, **kwargs):
+    if kwargs.get('signal') is post_delete:
+        subject_page = reverse('course_list_subject', args=[instance.slug])
+        schedule_refresh(removed=[subject_page], catalog=True)
+    else:
+        course_ids = instance.courses.values_list('id', flat=True)
+        schedule_refresh(removed=renamed(instance, 'course_list_subject'),
+                         course_ids=course_ids, catalog=True)
+
+
+def connect_signals():
+    for model, handler in ((Course, course_changed),
+                           (Module, module_changed),
+                           (Subject, subject_changed)):
+        dispatch_uid = 'snapshot_{}'.format(model.__name__)
+        post_save.connect(handler, sender=model, dispatch_uid=dispatch_uid)
+        post_delete.connect(handler, sender=model, dispatch_uid=dispatch_uid)
+    for model in (Course, Subject):
+        pre_save.connect(remember_slug, sender=model,
+                         dispatch_uid='snapshot_slug_{}'.format(model.__name__))
+
+
+def remove_stale_files(paths):
+    """
+    Delete snapshot files of pages that no longer exist, e.g. renamed
+    courses, and the directories they leave empty.
+    """
+    root = snapshot_root()
+    wanted = set(file_for_path(path) for path in paths)
+    for directory, subdirs, files in os.walk(root, topdown=False):
+        for filename in files:
+            full_path = os.path.join(directory, filename)
+            if full_path not in wanted:
+                os.remove(full_path)
+        if directory != root and not os.listdir(directory):
+            shutil.rmtree(directory)
@@ -0,0 +1,154 @@
+"""
+Content addressed storage for File and Image uploads.
+
+Uploads are hashed while they are streamed to disk and stored once under
+their SHA-256, e.g. blobs/3f/a2/3fa2...c1.pdf, whatever their original name
+or upload_to. Uploading the same document again reuses the existing blob,
+so identical media share one URL that never changes content and can be
+cached for good.
+
+Each blob has a Blob row counting the items that point to it. Storing an
+upload takes a reference for the item being saved, items release theirs
+when deleted or given a new file. Once the transaction that dropped the
+last reference has committed the file and its row are removed. Whoever
+checks for or deletes a blob's file holds its row lock, so an upload can
+not keep a copy that is about to be deleted.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .commit import on_commit
+
+# blobs stored by the current thread whose reference the saved item takes
+_uploads = threading.local()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    directory = 'blobs'
+
+    def get_available_name(self, name, max_length=None):
+        # the final name is only known once the content is hashed, and the
+        # same content must map to the same name
+        return name
+
+    def blob_name(self, digest, original_name):
+        extension = os.path.splitext(original_name)[1].lower()
+        return '{}/{}/{}/{}{}'.format(self.directory, digest[:2], digest[2:4],
+                                      digest, extension)
+
+    def _save(self, name, content):
+        blobs_dir = self.path(self.directory)
+        if not os.path.isdir(blobs_dir):
+            os.makedirs(blobs_dir)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=blobs_dir, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            name = self.blob_name(digest.hexdigest(), name)
+            full_path = self.path(name)
+            with transaction.atomic():
+                lock_blob(name)
+                if os.path.exists(full_path):
+                    # already stored, keep the existing copy
+                    os.remove(tmp_path)
+                else:
+                    directory = os.path.dirname(full_path)
+                    if not os.path.isdir(directory):
+                        os.makedirs(directory)
+                    os.rename(tmp_path, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+                add_reference(name)
+            uploaded().update([name])
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def uploaded():
+    if not hasattr(_uploads, 'names'):
+        _uploads.names = Counter()
+    return _uploads.names
+
+
+def claim_upload(name):
+    """
+    Return whether the current thread stored name and already took the
+    reference for it, see ContentAddressedStorage._save().
+    """
+    names = uploaded()
+    if names[name] <= 0:
+        return False
+    names[name] -= 1
+    return True
+
+
+def lock_blob(name):
+    """
+    Return the Blob row of name, created if needed and locked until the
+    current transaction ends.
+    """
+    from .models import Blob
+    while True:
+        Blob.objects.get_or_create(name=name)
+        blob = Blob.objects.select_for_update().filter(name=name).first()
+        # None when deleted by delete_unused_blob() before we got the lock
+        if blob is not None:
+            return blob
+
+
+def add_reference(name):
+    from .models import Blob
+    Blob.objects.filter(name=name).update(references=F('references') + 1)
+
+
+def retain_blob(name):
+    with transaction.atomic():
+        lock_blob(name)
+        add_reference(name)
+
+
+def release_blob(name):
+    """
+    Drop one reference to name, deleting the blob once nothing uses it.
+    Names that are not blobs, e.g. files stored before deduplication, are
+    left alone.
+    """
+    from .models import Blob
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(name=name).first()
+        if blob is None or blob.references == 0:
+            return
+        Blob.objects.filter(pk=blob.pk).update(references=F('references') - 1)
+    if blob.references == 1:
+        # a rollback would bring the reference back, but not the file
+        on_commit(lambda: delete_unused_blob(name))
+
+
+def delete_unused_blob(name):
+    from .models import Blob
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(name=name).first()
+        # retained again since it was released
+        if blob is None or blob.references > 0:
+            return
+        blob_storage.delete(name)
+        blob.delete()
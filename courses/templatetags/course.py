@@ -22,3 +22,16 @@ def model_name(obj):
 
 # this is the model_name filter we can apply it in templates
 # as object|model_name to get the models name of an object
+
+
+@register.filter
+def duration(seconds):
+    # 125 -> 2:05, 3725 -> 1:02:05
+    try:
+        minutes, seconds = divmod(int(seconds), 60)
+    except (TypeError, ValueError):
+        return ''
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+    return '{}:{:02d}'.format(minutes, seconds)
@@ -1,3 +1,465 @@
-from django.test import TestCase
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+from urllib.request import urlopen
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.urlresolvers import reverse
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from embed_video.backends import UnknownBackendException
+
+from . import commit, revisions, snapshot, video
+from .models import Subject, Course, Module, Content, Text, TextRevision, Video, Blob, File
+from .storage import blob_storage
 
 # Create your tests here.
+
+
+class ProviderHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for a video provider's info endpoint: /videos/<id>.json
+    returns the video's duration and thumbnail, video 7 answers slowly.
+    """
+    def do_GET(self):
+        code = self.path.split('/')[-1].split('.')[0]
+        if code == '7':
+            time.sleep(1)
+        body = json.dumps({
+            'duration': 125,
+            'thumbnail': 'http://{}:{}/thumbs/{}.jpg'.format(
+                self.server.server_name, self.server.server_port, code),
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalVideoBackend(object):
+    """
+    Minimal embed_video style backend for videos served by ProviderHandler.
+    """
+    endpoint = None
+
+    def __init__(self, url):
+        match = re.search(r'/videos/(\d+)$', url)
+        if match is None:
+            raise UnknownBackendException
+        self.code = match.group(1)
+
+    def get_info(self):
+        url = '{}/videos/{}.json'.format(self.endpoint, self.code)
+        return json.loads(urlopen(url, timeout=10).read().decode('utf-8'))
+
+    def get_thumbnail_url(self):
+        return self.get_info()['thumbnail']
+
+    def get_embed_code(self, width, height):
+        return '<iframe width="{}" height="{}" src="{}/embed/{}"></iframe>'.format(
+            width, height, self.endpoint, self.code)
+
+
+class ThumbnailOnlyBackend(LocalVideoBackend):
+    """
+    Like embed_video's YoutubeBackend: the thumbnail URL is built locally
+    and get_info() is left to the base class, which does not implement it.
+    """
+    def get_info(self):
+        raise NotImplementedError
+
+    def get_thumbnail_url(self):
+        return '{}/thumbs/{}.jpg'.format(self.endpoint, self.code)
+
+
+@override_settings(VIDEO_METADATA_ASYNC=False)
+class VideoMetadataTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(VideoMetadataTest, cls).setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), ProviderHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        LocalVideoBackend.endpoint = 'http://127.0.0.1:{}'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super(VideoMetadataTest, cls).tearDownClass()
+
+    def setUp(self):
+        self.owner = User.objects.create_user('instructor', password='secret')
+        patcher = mock.patch.object(video, 'detect_backend', LocalVideoBackend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_video(self, code):
+        return Video.objects.create(owner=self.owner, title='Video',
+                                    url='{}/videos/{}'.format(LocalVideoBackend.endpoint, code))
+
+    def test_metadata_is_stored_on_save(self):
+        item = self.create_video(42)
+        item.refresh_from_db()
+        self.assertEqual(item.provider, 'localvideo')
+        self.assertEqual(item.video_id, '42')
+        self.assertEqual(item.duration, 125)
+        self.assertTrue(item.thumbnail.endswith('/thumbs/42.jpg'))
+        self.assertIn('width="480"', item.embed_code)
+        self.assertIsNotNone(item.resolved)
+
+    @override_settings(VIDEO_METADATA_TIMEOUT=0.1)
+    def test_slow_provider_keeps_local_metadata(self):
+        item = self.create_video(7)
+        item.refresh_from_db()
+        self.assertEqual(item.video_id, '7')
+        self.assertIn('<iframe', item.embed_code)
+        self.assertIsNone(item.duration)
+        self.assertEqual(item.thumbnail, '')
+        self.assertIsNotNone(item.resolved)
+
+    def test_unknown_url_is_marked_resolved(self):
+        item = Video.objects.create(owner=self.owner, title='Video',
+                                    url='http://example.com/not-a-video')
+        item.refresh_from_db()
+        self.assertEqual(item.embed_code, '')
+        self.assertIsNotNone(item.resolved)
+
+    def test_render_uses_stored_metadata(self):
+        item = self.create_video(42)
+        item.refresh_from_db()
+        with mock.patch.object(video, 'detect_backend') as detect:
+            html = item.render()
+        self.assertFalse(detect.called)
+        self.assertIn(item.embed_code, html)
+        self.assertIn('2:05', html)
+
+    def test_changing_url_resolves_again(self):
+        item = self.create_video(42)
+        item.refresh_from_db()
+        item.url = '{}/videos/43'.format(LocalVideoBackend.endpoint)
+        item.save()
+        item.refresh_from_db()
+        self.assertEqual(item.video_id, '43')
+
+    def test_backend_without_info_keeps_thumbnail(self):
+        with mock.patch.object(video, 'detect_backend', ThumbnailOnlyBackend), \
+                mock.patch.object(video, 'logger') as logger:
+            item = self.create_video(42)
+        item.refresh_from_db()
+        self.assertTrue(item.thumbnail.endswith('/thumbs/42.jpg'))
+        self.assertIsNone(item.duration)
+        self.assertFalse(logger.exception.called)
+
+    @override_settings(VIDEO_METADATA_ASYNC=True)
+    def test_background_resolution_waits_for_commit(self):
+        with mock.patch.object(video, '_resolvers') as resolvers:
+            self.create_video(42)
+            # the test case's transaction is still open
+            self.assertFalse(resolvers.submit.called)
+
+
+@override_settings(SNAPSHOT_ROOT='/nonexistent/snapshot/')
+class SnapshotRefreshTest(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('instructor', password='secret')
+        self.subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = Course.objects.create(owner=owner, subject=self.subject, title='Python',
+                                            slug='python', overview='')
+        patcher = mock.patch.object(snapshot, '_refresher')
+        self.refresher = patcher.start()
+        self.addCleanup(patcher.stop)
+        # drop what setUp queued, the test case's transaction never commits
+        snapshot.submit_pending()
+        self.refresher.reset_mock()
+
+    def submitted(self):
+        snapshot.submit_pending()
+        self.assertEqual(self.refresher.submit.call_count, 1)
+        return self.refresher.submit.call_args[1]
+
+    def test_module_changes_are_coalesced(self):
+        for i in range(20):
+            Module.objects.create(course=self.course, title='Module {}'.format(i))
+        Module.objects.filter(course=self.course).delete()
+        self.assertEqual(self.submitted()['course_ids'], {self.course.id})
+
+    def test_renamed_course_removes_old_page(self):
+        self.course.slug = 'python-3'
+        self.course.save()
+        pending = self.submitted()
+        self.assertEqual(pending['removed'], {'/course/python/'})
+        self.assertEqual(pending['paths'], {'/course/python-3/'})
+        self.assertTrue(pending['catalog'])
+
+
+@override_settings(SNAPSHOT_ROOT=None,
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CourseModuleDiffTest(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('instructor', password='secret')
+        subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = Course.objects.create(owner=self.owner, subject=subject, title='Python',
+                                            slug='python', overview='')
+        self.module = Module.objects.create(course=self.course, title='Introduction')
+        self.text = Text.objects.create(owner=self.owner, title='Welcome', content='Hello')
+        Content.objects.create(module=self.module, item=self.text)
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.login(username='instructor', password='secret')
+        self.url = reverse('course_module_diff', args=[self.course.id])
+        self.body = json.dumps({'deleted': [self.module.id]})
+
+    def csrf_token(self):
+        token = 'a' * 32
+        self.client.cookies['csrftoken'] = token
+        return token
+
+    def test_requires_csrf_token(self):
+        response = self.client.post(self.url, self.body, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Module.objects.filter(id=self.module.id).exists())
+
+    def test_rejects_form_encoded_json(self):
+        response = self.client.post(self.url, self.body, content_type='text/plain',
+                                    HTTP_X_CSRFTOKEN=self.csrf_token())
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Module.objects.filter(id=self.module.id).exists())
+
+    def test_rejects_wrong_payload_types(self):
+        token = self.csrf_token()
+        for diff in [{'added': 5}, {'deleted': str(self.module.id)}, {'changed': [1]},
+                     {'deleted': [None]}]:
+            response = self.client.post(self.url, json.dumps(diff), content_type='application/json',
+                                        HTTP_X_CSRFTOKEN=token)
+            self.assertEqual(response.status_code, 400, diff)
+        self.assertTrue(Module.objects.filter(id=self.module.id).exists())
+
+    def test_delete_removes_items(self):
+        response = self.client.post(self.url, self.body, content_type='application/json',
+                                    HTTP_X_CSRFTOKEN=self.csrf_token())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Module.objects.filter(id=self.module.id).exists())
+        self.assertFalse(Content.objects.exists())
+        self.assertFalse(Text.objects.filter(id=self.text.id).exists())
+
+
+class TextRevisionTest(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('instructor', password='secret')
+
+    def test_delta_round_trip(self):
+        old = 'one\ntwo\nthree\nfour\n'
+        for new in ['one\n2\nthree\nfour\n', 'zero\none\nfour', '', 'one\ntwo\nthree\nfour\nfive']:
+            self.assertEqual(revisions.apply_delta(old, revisions.make_delta(old, new)), new)
+            self.assertEqual(revisions.apply_delta(new, revisions.make_delta(new, old)), old)
+
+    def test_every_version_is_rebuilt(self):
+        text = Text.objects.create(owner=self.owner, title='Notes', content='line 0\n')
+        contents = [text.content]
+        for i in range(1, revisions.FULL_EVERY + 5):
+            # grow the text and edit a line in the middle
+            lines = ['line {}\n'.format(n) for n in range(i + 1)]
+            lines[i // 2] = 'edited in version {}\n'.format(i + 1)
+            text.content = ''.join(lines)
+            text.save()
+            contents.append(text.content)
+        self.assertEqual(text.version, len(contents))
+        full = set(text.revisions.filter(full=True).values_list('version', flat=True))
+        self.assertEqual(full, {1, revisions.FULL_EVERY + 1})
+        text = Text.objects.get(id=text.id)
+        for version, content in enumerate(contents, 1):
+            self.assertEqual(text.get_version(version), content)
+
+    def test_unchanged_content_keeps_version(self):
+        text = Text.objects.create(owner=self.owner, title='Notes', content='Hello\n')
+        text.title = 'Renamed'
+        text.save()
+        self.assertEqual(text.version, 1)
+        self.assertEqual(text.revisions.count(), 1)
+        text.content = 'Hello world\n'
+        text.save()
+        self.assertEqual(text.version, 2)
+        self.assertEqual(text.revisions.count(), 2)
+
+    def test_unknown_version(self):
+        text = Text.objects.create(owner=self.owner, title='Notes', content='Hello\n')
+        with self.assertRaises(TextRevision.DoesNotExist):
+            text.get_version(0)
+
+
+@override_settings(SNAPSHOT_ROOT=None,
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ContentAdminTest(TestCase):
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        subject = Subject.objects.create(title='Programming', slug='programming')
+        course = Course.objects.create(owner=admin, subject=subject, title='Python',
+                                       slug='python', overview='')
+        module = Module.objects.create(course=course, title='Introduction')
+        text = Text.objects.create(owner=admin, title='Welcome', content='Hello')
+        self.content = Content.objects.create(module=module, item=text)
+        self.client.login(username='admin', password='secret')
+
+    def test_changelist(self):
+        response = self.client.get(reverse('admin:courses_content_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'content_type__id__exact')
+
+    def test_change_page(self):
+        response = self.client.get(reverse('admin:courses_content_change', args=[self.content.id]))
+        self.assertEqual(response.status_code, 200)
+
+
+class OnCommitTest(TransactionTestCase):
+
+    def test_runs_after_outermost_block(self):
+        calls = []
+        with transaction.atomic():
+            with transaction.atomic():
+                commit.on_commit(lambda: calls.append(1))
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+
+    def test_callback_can_open_a_transaction(self):
+        def create_user():
+            with transaction.atomic():
+                User.objects.create_user('late')
+
+        with transaction.atomic():
+            commit.on_commit(create_user)
+        self.assertTrue(User.objects.filter(username='late').exists())
+
+    def test_dropped_on_rollback(self):
+        calls = []
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                commit.on_commit(lambda: calls.append(1))
+                raise ValueError
+        with transaction.atomic():
+            commit.on_commit(lambda: calls.append(2))
+        self.assertEqual(calls, [2])
+
+    def test_runs_right_away_outside_transaction(self):
+        calls = []
+        commit.on_commit(lambda: calls.append(1))
+        self.assertEqual(calls, [1])
+
+
+class BlobStorageTest(TransactionTestCase):
+    """
+    Runs without a wrapping transaction, blob files are only deleted once
+    the deleting transaction commits.
+    """
+    def setUp(self):
+        self.owner = User.objects.create_user('instructor', password='secret')
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        patcher = mock.patch.object(blob_storage, 'location', location)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, data, name='notes.pdf'):
+        return File.objects.create(owner=self.owner, title='Notes',
+                                   file=ContentFile(data, name=name))
+
+    def references(self, name):
+        blob = Blob.objects.filter(name=name).first()
+        return blob.references if blob else None
+
+    def stored(self, name):
+        return os.path.exists(blob_storage.path(name))
+
+    def test_duplicate_uploads_share_a_blob(self):
+        first = self.upload(b'same content')
+        second = self.upload(b'same content', name='copy.PDF')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+        self.assertEqual(self.references(first.file.name), 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(blob_storage.path(first.file.name)))), 1)
+
+    def test_uploading_the_same_content_again_keeps_one_reference(self):
+        item = self.upload(b'same content')
+        item.file = ContentFile(b'same content', name='notes.pdf')
+        item.save()
+        self.assertEqual(self.references(item.file.name), 1)
+
+    def test_replacing_the_file_releases_the_old_blob(self):
+        item = self.upload(b'version 1')
+        old_name = item.file.name
+        item.file = ContentFile(b'version 2', name='notes.pdf')
+        item.save()
+        self.assertIsNone(self.references(old_name))
+        self.assertFalse(self.stored(old_name))
+        self.assertEqual(self.references(item.file.name), 1)
+        self.assertTrue(self.stored(item.file.name))
+
+    def test_file_is_deleted_with_the_last_reference(self):
+        first = self.upload(b'shared')
+        second = self.upload(b'shared')
+        name = first.file.name
+        first.delete()
+        self.assertEqual(self.references(name), 1)
+        self.assertTrue(self.stored(name))
+        second.delete()
+        self.assertIsNone(self.references(name))
+        self.assertFalse(self.stored(name))
+
+    def test_copied_item_takes_a_reference(self):
+        item = self.upload(b'shared')
+        name = item.file.name
+        original_id = item.id
+        item.pk = None
+        item.save()
+        self.assertEqual(self.references(name), 2)
+        File.objects.get(id=original_id).delete()
+        self.assertTrue(self.stored(name))
+        self.assertEqual(self.references(name), 1)
+
+    def test_rolled_back_delete_keeps_the_file(self):
+        item = self.upload(b'precious')
+        name = item.file.name
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                item.delete()
+                raise ValueError
+        self.assertEqual(self.references(name), 1)
+        self.assertTrue(self.stored(name))
+
+
+@override_settings(SNAPSHOT_ROOT=None,
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CourseListTest(TestCase):
+
+    def test_courses_have_module_counts(self):
+        owner = User.objects.create_user('instructor', password='secret')
+        subject = Subject.objects.create(title='Programming', slug='programming')
+        python = Course.objects.create(owner=owner, subject=subject, title='Python',
+                                       slug='python', overview='')
+        Course.objects.create(owner=owner, subject=subject, title='Django',
+                              slug='django', overview='')
+        for i in range(3):
+            Module.objects.create(course=python, title='Module {}'.format(i))
+        for url in [reverse('course_list'), reverse('course_list_subject', args=['programming'])]:
+            response = self.client.get(url)
+            counts = [(course.slug, course.total_modules) for course in response.context['courses']]
+            # newest first
+            self.assertEqual(counts, [('django', 0), ('python', 3)])
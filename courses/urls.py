@@ -12,6 +12,8 @@ urlpatterns = [
         name='course_delete'),
     url(r'^(?P<pk>\d+)/module/$', views.CourseModuleUpdateView.as_view(),
         name='course_module_update'),
+    url(r'^(?P<pk>\d+)/module/diff/$', views.CourseModuleDiffView.as_view(),
+        name='course_module_diff'),
     url(r'^module/(?P<module_id>\d+)/content/(?P<model_name>\w+)/create/$',
         views.ContentCreateUpdateView.as_view(),
         name='module_content_create'),
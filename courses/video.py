@@ -0,0 +1,105 @@
+"""
+Video metadata resolution.
+
+When a Video is saved with a new URL we look up its provider, video id,
+embed code, thumbnail and duration through the embed_video backends and
+store them on the model, so rendering a module never parses URLs or calls
+a provider. Parsing and building the embed code is local; the thumbnail
+and duration may need a request to the provider, which is given
+VIDEO_METADATA_TIMEOUT seconds before we settle for what we have.
+
+Resolution runs on a small thread pool after the transaction commits, see
+courses.commit. Videos left unresolved, e.g. when the process exited
+first, are picked up by the resolve_videos command.
+Set VIDEO_METADATA_ASYNC = False to resolve inline, e.g. in tests.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from embed_video.backends import detect_backend, EmbedVideoException
+
+from .commit import on_commit
+
+logger = logging.getLogger(__name__)
+
+# width and height of the stored embed code, the 'small' size of embed_video
+EMBED_SIZE = (480, 360)
+
+# one pool runs the resolutions, the other the provider requests so a
+# hanging provider can be abandoned after the timeout
+_resolvers = ThreadPoolExecutor(max_workers=2)
+_lookups = ThreadPoolExecutor(max_workers=4)
+
+
+def provider_info(backend):
+    info = {'thumbnail': backend.get_thumbnail_url() or ''}
+    try:
+        details = backend.get_info() or {}
+    except NotImplementedError:
+        # only some backends, e.g. Vimeo, have an info API; YouTube has not
+        details = {}
+    duration = details.get('duration')
+    if duration:
+        info['duration'] = int(duration)
+    return info
+
+
+def resolve_video(url, timeout=None):
+    """
+    Return the metadata fields for url. Raises EmbedVideoException if no
+    backend recognises the URL.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'VIDEO_METADATA_TIMEOUT', 5)
+    backend = detect_backend(url)
+    data = {
+        'provider': type(backend).__name__.replace('Backend', '').lower(),
+        'video_id': backend.code,
+        'embed_code': backend.get_embed_code(*EMBED_SIZE),
+    }
+    lookup = _lookups.submit(provider_info, backend)
+    try:
+        data.update(lookup.result(timeout=timeout))
+    except TimeoutError:
+        logger.warning('Video provider lookup for %s timed out after %ss', url, timeout)
+    except Exception:
+        logger.exception('Video provider lookup for %s failed', url)
+    return data
+
+
+def update_video(model, pk, url):
+    try:
+        data = resolve_video(url)
+    except EmbedVideoException:
+        logger.warning('No video backend for %s', url)
+        data = {}
+    data['resolved'] = timezone.now()
+    # skip the update if the URL was edited again in the meantime
+    model.objects.filter(pk=pk, url=url).update(**data)
+
+
+def update_video_in_background(model, pk, url):
+    try:
+        update_video(model, pk, url)
+    except Exception:
+        logger.exception('Resolving video %s failed', pk)
+    finally:
+        # worker threads open their own connection
+        connection.close()
+
+
+def schedule_resolution(video):
+    args = (type(video), video.pk, video.url)
+    if not getattr(settings, 'VIDEO_METADATA_ASYNC', True):
+        update_video(*args)
+        return
+
+    def submit():
+        _resolvers.submit(update_video_in_background, *args)
+
+    # the worker updates the row from its own connection, it must see the
+    # committed row and not wait on our write lock
+    on_commit(submit)
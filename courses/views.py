@@ -8,10 +8,13 @@ from django.core.cache import cache
 from braces.views import LoginRequiredMixin, PermissionRequiredMixin, CsrfExemptMixin, JsonRequestResponseMixin
 from django.forms.models import modelform_factory
 from django.apps import apps
-from django.db.models import Count
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db import transaction
+from django.db.models import Count, Max
 
-from .models import Course, Module, Content, Subject
-from .forms import ModuleFormSet
+from .models import Course, Module, Content, Subject, delete_items
+from .forms import ModuleFormSet, ModuleForm
+from .snapshot import course_modules_changed
 from students.forms import CourseEnrollForm
 
 # create mixins first
@@ -67,11 +70,24 @@ class CourseDeleteView(OwnerCourseMixin, DeleteView):
 class CourseModuleUpdateView(TemplateResponseMixin, View):
     template_name = 'courses/manage/module/formset.html'
     course = None
+    page = None
+    # modules rendered per page, large courses would build huge formsets
+    paginate_by = 20
 
     # define get_formset to avoid repeating the code to build the formset
     def get_formset(self, data=None):
         # return the ModuleFormSet object for the given course object with optional data
-        return ModuleFormSet(instance=self.course, data=data)
+        # only the modules of the current page are loaded into the formset
+        module_ids = self.course.modules.order_by('order', 'id').values_list('id', flat=True)
+        paginator = Paginator(module_ids, self.paginate_by)
+        try:
+            self.page = paginator.page(self.request.GET.get('page'))
+        except PageNotAnInteger:
+            self.page = paginator.page(1)
+        except EmptyPage:
+            self.page = paginator.page(paginator.num_pages)
+        queryset = Module.objects.filter(id__in=list(self.page.object_list)).order_by('order', 'id')
+        return ModuleFormSet(instance=self.course, data=data, queryset=queryset)
 
     """
     dispatch() : This method is provided by the View class. It takes an HTTP
@@ -100,7 +116,8 @@ class CourseModuleUpdateView(TemplateResponseMixin, View):
         return self.render_to_response(
             {
                 'course': self.course,
-                'formset': formset
+                'formset': formset,
+                'page_obj': self.page,
                 })
 
 
@@ -112,10 +129,107 @@ class CourseModuleUpdateView(TemplateResponseMixin, View):
         return self.render_to_response(
             {
                 'course': self.course,
-                'formset': formset
+                'formset': formset,
+                'page_obj': self.page,
                 })
 
 
+class CourseModuleDiffView(LoginRequiredMixin, JsonRequestResponseMixin, View):
+    """
+    Apply only the modules that were added, changed or deleted, instead of
+    posting every module of the course through the formset:
+
+        {
+            "added": [{"title": "...", "description": "..."}],
+            "changed": {"<module id>": {"title": "..."}},
+            "deleted": [<module id>, ...]
+        }
+
+    Everything is validated first and then written in one transaction, so
+    editing a single title costs the same few queries for any course size.
+
+    Unlike the order views this one deletes, so it is not CSRF exempt: send
+    the csrftoken cookie's value in an X-CSRFToken header along with a JSON
+    content type.
+    """
+    raise_exception = True
+
+    def post(self, request, pk):
+        # braces parses the body whatever its type, a cross-site form can
+        # not send application/json
+        content_type = request.META.get('CONTENT_TYPE', '').split(';')[0].strip()
+        if content_type != 'application/json':
+            return self.render_bad_request_response({'error': 'Expected application/json.'})
+        course = get_object_or_404(Course, id=pk, owner=request.user)
+        diff = self.request_json
+        if not isinstance(diff, dict):
+            return self.render_bad_request_response({'error': 'Expected a JSON object.'})
+        added = diff.get('added') or []
+        changed = diff.get('changed') or {}
+        deleted = diff.get('deleted') or []
+        if not (isinstance(added, list) and isinstance(changed, dict) and isinstance(deleted, list)):
+            return self.render_bad_request_response(
+                {'error': 'Expected lists for added and deleted and an object for changed.'})
+        try:
+            changed = {int(id): fields for id, fields in changed.items()}
+            deleted = set(int(id) for id in deleted)
+        except (TypeError, ValueError):
+            return self.render_bad_request_response({'error': 'Module ids must be integers.'})
+
+        # one query loads the touched modules and checks they belong to the course
+        modules = course.modules.in_bulk(list(changed) + list(deleted))
+        missing = (set(changed) | deleted) - set(modules)
+        if missing:
+            return self.render_bad_request_response(
+                {'error': 'Unknown modules: {}'.format(sorted(missing))})
+
+        errors = {}
+        updates = {}
+        for id, fields in changed.items():
+            module = modules[id]
+            data = {'title': module.title, 'description': module.description}
+            data.update(fields if isinstance(fields, dict) else {})
+            form = ModuleForm(data=data, instance=module)
+            if form.is_valid():
+                updates[id] = form.cleaned_data
+            else:
+                errors[str(id)] = form.errors
+        new_modules = []
+        for index, fields in enumerate(added):
+            form = ModuleForm(data=fields if isinstance(fields, dict) else {})
+            if form.is_valid():
+                new_modules.append(Module(course=course, **form.cleaned_data))
+            else:
+                errors['added.{}'.format(index)] = form.errors
+        if errors:
+            return self.render_bad_request_response({'errors': errors})
+
+        with transaction.atomic():
+            if deleted:
+                # the modules' contents cascade, their items have to go first
+                delete_items(Content.objects.filter(module_id__in=deleted))
+                Module.objects.filter(id__in=deleted).delete()
+            for id, fields in updates.items():
+                Module.objects.filter(id=id).update(**fields)
+            if new_modules:
+                # OrderField would look up the last order once per module
+                last = course.modules.aggregate(last=Max('order'))['last']
+                first = 0 if last is None else last + 1
+                for order, module in enumerate(new_modules, first):
+                    module.order = order
+                Module.objects.bulk_create(new_modules)
+            # update() and bulk_create() send no signals, refresh the
+            # snapshot ourselves; the deletes' signals are coalesced with it
+            course_modules_changed(course.id)
+
+        return self.render_json_response({
+            'saved': 'OK',
+            'added': len(new_modules),
+            'changed': len(updates),
+            'deleted': len(deleted),
+        })
+
+
 class ContentCreateUpdateView(TemplateResponseMixin, View):
     module = None
     model = None
@@ -173,8 +287,11 @@ class ContentDeleteView(View):
     def post(self, request, id):
         content = get_object_or_404(Content, id=id, module__course__owner=request.user)
         module = content.module
-        content.item.delete()
-        content.delete()
+        # deleting a File or Image item only removes its stored blob once no
+        # other item references the same content
+        with transaction.atomic():
+            content.item.delete()
+            content.delete()
 
         return redirect('module_content_list', module.id)
 
@@ -215,6 +332,27 @@ class ContentOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
         })
 
 
+def module_counts(courses):
+    """
+    (course id, number of modules) of the courses in the courses queryset.
+    """
+    return (Module.objects.filter(course__in=courses.order_by().values('id'))
+            .order_by().values_list('course').annotate(total=Count('id')))
+
+
+def with_module_counts(courses):
+    """
+    Evaluate courses and set total_modules on each. Counting in a separate
+    query keeps the GROUP BY off the courses, which can then be read in
+    the order of the (subject, created) index instead of being sorted.
+    """
+    counts = dict(module_counts(courses))
+    courses = list(courses)
+    for course in courses:
+        course.total_modules = counts.get(course.id, 0)
+    return courses
+
+
 class CourseListView(TemplateResponseMixin, View):
     model = Course
     template_name = 'courses/course/list.html'
@@ -239,7 +377,7 @@ class CourseListView(TemplateResponseMixin, View):
                         total_courses=Count('courses'))
             cache.set('all_subjects', subjects)
 
-        all_courses = Course.objects.annotate(total_modules=Count('modules'))
+        all_courses = Course.objects.all()
 
         """"
         We retrieve all available courses, including the total number of modules
@@ -254,12 +392,12 @@ class CourseListView(TemplateResponseMixin, View):
             key = 'subject_{}_courses'.format(subject.id)
             courses = cache.get(key)
             if not courses:
-                courses = all_courses.filter(subject=subject)
+                courses = with_module_counts(all_courses.filter(subject=subject))
                 cache.set(key, courses)
         else:
             courses = cache.get('all_courses')
             if not courses:
-                courses = all_courses
+                courses = with_module_counts(all_courses)
                 cache.set('all_courses', courses)
 
         """
@@ -0,0 +1,180 @@
+"""
+Memcached backend that compresses what it stores.
+
+Rendered pages cached by UpdateCacheMiddleware and cache_page are large and
+very repetitive HTML. Values at or above COMPRESS_MIN_LENGTH bytes are
+stored compressed, which keeps big module pages under memcached's 1 MB item
+limit and lets more items fit in the same memory:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'educa.cache.CompressedMemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+            'COMPRESS_MIN_LENGTH': 1024,
+        }
+    }
+
+Cached HttpResponse objects get their body gzip-encoded (the format
+browsers understand) rather than the whole pickle being zlib-compressed, so
+educa.middleware.GzipCachedResponseMiddleware can send the stored bytes to
+clients that accept gzip without recompressing them.
+
+python3-memcached only stores str values as they are: the bytes encode()
+returns are pickled once more by the client (_FLAG_PICKLE). That adds a
+few bytes of pickle framing per item, and the client's own compression is
+left off since ours has already run.
+"""
+import gzip
+import pickle
+import threading
+import zlib
+from io import BytesIO
+
+from django.core.cache.backends.memcached import MemcachedCache
+from django.http import HttpResponse
+
+# one byte prefix telling how the rest of the stored value is encoded
+PICKLED = b'p'
+ZLIB_PICKLED = b'z'
+
+
+def gzip_bytes(data, level):
+    buf = BytesIO()
+    with gzip.GzipFile(filename='', mode='wb', compresslevel=level,
+                       fileobj=buf, mtime=0) as gz:
+        gz.write(data)
+    return buf.getvalue()
+
+
+def gzip_response(response, level):
+    """
+    Return a gzip-encoded copy of response, or None if it is not worth it.
+    The original is left untouched because UpdateCacheMiddleware still
+    sends it to the client that triggered the caching.
+    """
+    if response.streaming or response.has_header('Content-Encoding'):
+        return None
+    compressed = gzip_bytes(response.content, level)
+    if len(compressed) >= len(response.content):
+        return None
+    gzipped = HttpResponse(compressed, status=response.status_code)
+    for header, value in response.items():
+        gzipped[header] = value
+    gzipped.cookies = response.cookies
+    gzipped['Content-Encoding'] = 'gzip'
+    if gzipped.has_header('Content-Length'):
+        gzipped['Content-Length'] = str(len(compressed))
+    # tells GzipCachedResponseMiddleware this body was gzipped by the cache
+    gzipped.gzipped_in_cache = True
+    return gzipped
+
+
+class CompressionStats(object):
+    """
+    Per process counters of what went through the backend. raw_bytes is
+    what the values would have taken uncompressed.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.values = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def record(self, raw_size, stored_size, compressed):
+        with self.lock:
+            self.values += 1
+            self.raw_bytes += raw_size
+            self.stored_bytes += stored_size
+            if compressed:
+                self.compressed += 1
+
+    @property
+    def ratio(self):
+        if not self.stored_bytes:
+            return 1.0
+        return float(self.raw_bytes) / self.stored_bytes
+
+    def as_dict(self):
+        return {
+            'values': self.values,
+            'compressed': self.compressed,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'ratio': self.ratio,
+        }
+
+
+class CompressedMemcachedCache(MemcachedCache):
+
+    def __init__(self, server, params):
+        super(CompressedMemcachedCache, self).__init__(server, params)
+        self.min_compress_len = int(params.get('COMPRESS_MIN_LENGTH', 1024))
+        self.compress_level = int(params.get('COMPRESS_LEVEL', 6))
+        self.compression_stats = CompressionStats()
+
+    def encode(self, value):
+        # integers stay native so incr() and decr() keep working
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        raw_extra = 0
+        compressed = False
+        if isinstance(value, HttpResponse) and not value.streaming \
+                and len(value.content) >= self.min_compress_len:
+            gzipped = gzip_response(value, self.compress_level)
+            if gzipped is not None:
+                raw_extra = len(value.content) - len(gzipped.content)
+                value = gzipped
+                compressed = True
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        stored = PICKLED + data
+        if not compressed and len(data) >= self.min_compress_len:
+            packed = zlib.compress(data, self.compress_level)
+            if len(packed) < len(data):
+                stored = ZLIB_PICKLED + packed
+                compressed = True
+        self.compression_stats.record(len(data) + 1 + raw_extra,
+                                      len(stored), compressed)
+        return stored
+
+    def decode(self, stored):
+        if not isinstance(stored, bytes):
+            return stored
+        flag, data = stored[:1], stored[1:]
+        if flag == ZLIB_PICKLED:
+            return pickle.loads(zlib.decompress(data))
+        if flag == PICKLED:
+            return pickle.loads(data)
+        # written by something else, hand it back as memcached returned it
+        return stored
+
+    def add(self, key, value, timeout=None, version=None):
+        return super(CompressedMemcachedCache, self).add(
+            key, self.encode(value), timeout, version)
+
+    def set(self, key, value, timeout=None, version=None):
+        super(CompressedMemcachedCache, self).set(
+            key, self.encode(value), timeout, version)
+
+    def get(self, key, default=None, version=None):
+        stored = super(CompressedMemcachedCache, self).get(key, None, version)
+        if stored is None:
+            return default
+        return self.decode(stored)
+
+    def set_many(self, data, timeout=None, version=None):
+        encoded = {key: self.encode(value) for key, value in data.items()}
+        super(CompressedMemcachedCache, self).set_many(encoded, timeout, version)
+
+    def get_many(self, keys, version=None):
+        found = super(CompressedMemcachedCache, self).get_many(keys, version)
+        return {key: self.decode(value) for key, value in found.items()}
+
+    def server_stats(self):
+        """
+        Raw memcached stats per server, as returned by the client library.
+        """
+        return self._cache.get_stats()
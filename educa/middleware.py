@@ -0,0 +1,28 @@
+import gzip
+from io import BytesIO
+
+from django.utils.cache import patch_vary_headers
+
+
+class GzipCachedResponseMiddleware(object):
+    """
+    Responses coming out of the cache may carry a body that
+    educa.cache.CompressedMemcachedCache stored gzip-encoded. Clients that
+    accept gzip get those bytes unchanged, everybody else gets them
+    decompressed. Put it first in MIDDLEWARE_CLASSES so it sees the response
+    after the cache middleware and cache_page have returned it.
+    """
+    def process_response(self, request, response):
+        if not getattr(response, 'gzipped_in_cache', False):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            return response
+        with gzip.GzipFile(fileobj=BytesIO(response.content)) as gz:
+            response.content = gz.read()
+        del response['Content-Encoding']
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        response.gzipped_in_cache = False
+        return response
+
@@ -39,12 +39,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'courses',
     'students',
+    'analytics',
     'embed_video',
     'memcache_status',
     'rest_framework',
 ]
 
 MIDDLEWARE_CLASSES = [
+    'educa.middleware.GzipCachedResponseMiddleware',
+    'analytics.middleware.ContentViewMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.cache.UpdateCacheMiddleware',
@@ -67,6 +70,10 @@ REST_FRAMEWORK = {
         ]
 }
 
+# course activity is buffered in memory and written out in batches
+ANALYTICS_BUFFER_SIZE = 500
+ANALYTICS_BUFFER_SECONDS = 60
+
 # high level caching settings
 CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 60 * 15 # 15 minutes
@@ -88,15 +95,30 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # compile each template once per process, educa.startup fills the cache
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'educa.wsgi.application'
 
+# import URLconfs and compile templates when the WSGI application is created
+WSGI_WARM_UP = True
+
 
 # Cash
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'BACKEND': 'educa.cache.CompressedMemcachedCache',
         'LOCATION': '127.0.0.1:11211',
+        # values at least this big are stored compressed
+        'COMPRESS_MIN_LENGTH': 1024,
     }
 }
 
@@ -148,6 +170,17 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/1.9/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
+
+# fingerprinted file names plus pre-compressed .gz copies on collectstatic
+STATICFILES_STORAGE = 'educa.storage.GzipManifestStaticFilesStorage'
+STATIC_CACHE_MAX_AGE = 60 * 60 * 24 * 365 # one year, for hashed names only
+
+# pre-rendered public catalog served by the front web server, see courses.snapshot
+SNAPSHOT_ROOT = os.path.join(BASE_DIR, 'snapshot/')
+
+# CSV files uploaded to the student import API wait here for import_students
+STUDENT_IMPORT_DIR = os.path.join(BASE_DIR, 'imports/')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
@@ -0,0 +1,183 @@
+"""
+Startup instrumentation and warm-up for the WSGI application.
+
+Set EDUCA_PROFILE_STARTUP=1 to time every module imported while the
+application loads and report the slowest ones, together with the
+warm-up time and the time from process start to the first response, on
+stderr:
+
+    EDUCA_PROFILE_STARTUP=1 gunicorn educa.wsgi
+
+Independently of that, WSGI_WARM_UP (on by default) imports every URLconf
+and view and compiles the templates into the cached loader when the
+application is created. With gunicorn --preload that happens once in the
+master, before the workers are forked, instead of on each worker's first
+requests.
+"""
+import builtins
+import importlib
+import os
+import sys
+import time
+from importlib.util import resolve_name
+
+PROCESS_STARTED = time.time()
+
+
+def profiling():
+    return os.environ.get('EDUCA_PROFILE_STARTUP', '') not in ('', '0')
+
+
+class ImportTimer(object):
+    """
+    Wraps import statements and importlib.import_module(), which Django
+    uses to load apps, URLconfs and middleware, to record for each module
+    imported for the first time the time spent importing it including
+    (cumulative) and excluding (self) the modules it imported in turn.
+    Must be installed before Django is imported.
+    """
+    def __init__(self):
+        self.times = {}
+        self.stack = []
+        self.active = False
+        self.original_import = builtins.__import__
+        self.original_import_module = importlib.import_module
+
+    def install(self):
+        self.active = True
+        builtins.__import__ = self.__import__
+        importlib.import_module = self.import_module
+
+    def uninstall(self):
+        # modules may hold on to our import_module, it stays a pass-through
+        self.active = False
+        builtins.__import__ = self.original_import
+        importlib.import_module = self.original_import_module
+
+    def __import__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        try:
+            package = (globals or {}).get('__package__') or ''
+            module = resolve_name('.' * level + name, package) if level else name
+        except (ImportError, ValueError):
+            module = name
+        return self.timed(module, self.original_import, name, globals, locals, fromlist, level)
+
+    def import_module(self, name, package=None):
+        try:
+            module = resolve_name(name, package) if name.startswith('.') else name
+        except (ImportError, ValueError):
+            module = name
+        return self.timed(module, self.original_import_module, name, package)
+
+    def timed(self, module, function, *args):
+        if not self.active or module in sys.modules:
+            return function(*args)
+        started = time.time()
+        self.stack.append(0.0)
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.time() - started
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            self.times[module] = (elapsed, elapsed - children)
+
+    def report(self, limit=30):
+        lines = ['Slowest imports ({} modules, cumulative / self ms):'.format(len(self.times))]
+        slowest = sorted(self.times.items(), key=lambda item: item[1][0], reverse=True)
+        for module, (cumulative, own) in slowest[:limit]:
+            lines.append('{:>10.1f} {:>10.1f}  {}'.format(cumulative * 1000, own * 1000, module))
+        return '\n'.join(lines)
+
+
+class FirstResponseTimer(object):
+    """
+    Reports how long after process start the first response was complete.
+    """
+    def __init__(self, application):
+        self.application = application
+        self.reported = False
+
+    def __call__(self, environ, start_response):
+        response = self.application(environ, start_response)
+        if not self.reported:
+            self.reported = True
+            log('First response {:.1f} ms after process start ({})'.format(
+                (time.time() - PROCESS_STARTED) * 1000, environ.get('PATH_INFO')))
+        return response
+
+
+import_timer = ImportTimer()
+
+
+def log(message):
+    sys.stderr.write('[educa.startup pid {}] {}\n'.format(os.getpid(), message))
+
+
+def begin():
+    if profiling():
+        import_timer.install()
+
+
+def template_names(directory):
+    for root, dirs, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith(('.html', '.txt')):
+                yield os.path.relpath(os.path.join(root, filename), directory)
+
+
+def warm_up():
+    """
+    Import every URLconf and view and compile all templates into the cached
+    loader. Returns the number of templates loaded and how many of them
+    failed to compile.
+    """
+    from django.core.urlresolvers import get_resolver
+    from django.template import engines
+    from django.template.loaders.cached import Loader as CachedLoader
+    from django.template.utils import get_app_template_dirs
+
+    resolver = get_resolver(None)
+    # populating the reverse dict walks every included URLconf
+    resolver.reverse_dict
+
+    directories = list(get_app_template_dirs('templates'))
+    loaded = failed = 0
+    for engine in engines.all():
+        if not hasattr(engine, 'engine'):
+            continue
+        # without the cached loader compiled templates are thrown away
+        if not any(isinstance(loader, CachedLoader) for loader in engine.engine.template_loaders):
+            continue
+        template_dirs = list(engine.engine.dirs) + directories
+        for directory in template_dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                    loaded += 1
+                except Exception:
+                    # e.g. templates of apps whose tag libraries are not installed
+                    failed += 1
+    return loaded, failed
+
+
+def ready(application):
+    """
+    Called by educa.wsgi with the freshly created application.
+    """
+    from django.conf import settings
+
+    if getattr(settings, 'WSGI_WARM_UP', True):
+        started = time.time()
+        loaded, failed = warm_up()
+        if profiling():
+            log('Warm-up loaded URLconfs and {} templates ({} failed) in {:.1f} ms'.format(
+                loaded, failed, (time.time() - started) * 1000))
+    if profiling():
+        import_timer.uninstall()
+        log('Application ready {:.1f} ms after process start'.format(
+            (time.time() - PROCESS_STARTED) * 1000))
+        log(import_timer.report())
+        application = FirstResponseTimer(application)
+    return application
@@ -0,0 +1,44 @@
+"""
+Serve collected static files with far-future caching.
+
+Fingerprinted files never change under the same name, so browsers may keep
+them for a year without revalidating. When the client accepts gzip and
+collectstatic produced a .gz sibling we serve that one as-is. Behind a front
+web server the same rules should be applied there and this view is only a
+fallback for deployments that let Django serve /static/.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views import static
+
+# names produced by ManifestStaticFilesStorage: base.55e7cbb9ba48.css
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+ONE_YEAR = 60 * 60 * 24 * 365
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def serve(request, path):
+    document_root = settings.STATIC_ROOT
+    served_path = path
+    gzip_path = path + '.gz'
+    if accepts_gzip(request) and os.path.isfile(os.path.join(document_root, gzip_path)):
+        # static.serve guesses the original content type and sets
+        # Content-Encoding: gzip from the .gz extension
+        served_path = gzip_path
+    response = static.serve(request, served_path, document_root=document_root)
+    if response.status_code == 200:
+        if HASHED_NAME_RE.search(path):
+            max_age = getattr(settings, 'STATIC_CACHE_MAX_AGE', ONE_YEAR)
+        else:
+            # unhashed names can change in place, keep them short lived
+            max_age = getattr(settings, 'STATIC_UNHASHED_MAX_AGE', 60 * 5)
+        patch_cache_control(response, public=True, max_age=max_age)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
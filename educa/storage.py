@@ -0,0 +1,59 @@
+"""
+Static files storage for production builds.
+
+collectstatic copies every static file into STATIC_ROOT under a
+fingerprinted name (css/base.css -> css/base.55e7cbb9ba48.css) and records
+the mapping in staticfiles.json, so the {% static %} tag can emit the hashed
+names. On top of that we write a pre-compressed .gz sibling next to each
+text asset, which the front web server (or educa.static.serve) hands out
+as-is to clients that accept gzip instead of compressing on every request.
+"""
+import gzip
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+
+class GzipManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # file types worth compressing, images and fonts are already compressed
+    gzip_extensions = getattr(settings, 'STATIC_GZIP_EXTENSIONS', (
+        '.css', '.js', '.html', '.txt', '.svg', '.json', '.xml', '.map',
+    ))
+    # below this size the gzip header costs more than it saves
+    gzip_min_length = getattr(settings, 'STATIC_GZIP_MIN_LENGTH', 256)
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = super(GzipManifestStaticFilesStorage, self).post_process(
+            paths, dry_run=dry_run, **options)
+        for name, hashed_name, result in processed:
+            yield name, hashed_name, result
+            if dry_run or isinstance(result, Exception):
+                continue
+            # compress both the original and the fingerprinted copy
+            for path in (name, hashed_name):
+                if path and self.gzip_file(path):
+                    yield path, path + '.gz', True
+
+    def gzip_file(self, name):
+        if os.path.splitext(name)[1].lower() not in self.gzip_extensions:
+            return False
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < self.gzip_min_length:
+            return False
+        # mtime=0 keeps the output byte-identical between builds
+        buf = BytesIO()
+        with gzip.GzipFile(filename='', mode='wb', compresslevel=9,
+                           fileobj=buf, mtime=0) as gz:
+            gz.write(content)
+        compressed = buf.getvalue()
+        if len(compressed) >= len(content):
+            return False
+        gzip_name = name + '.gz'
+        if self.exists(gzip_name):
+            self.delete(gzip_name)
+        self._save(gzip_name, ContentFile(compressed))
+        return True
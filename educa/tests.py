@@ -0,0 +1,156 @@
+import gzip
+import pickle
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory
+
+from .cache import CompressedMemcachedCache, PICKLED, ZLIB_PICKLED
+from .middleware import GzipCachedResponseMiddleware
+
+
+class FakeMemcachedClient(object):
+    """
+    The part of the python3-memcached client the backend uses, storing
+    values as they are handed over.
+    """
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, time=0):
+        self.data[key] = value
+        return True
+
+    def add(self, key, value, time=0):
+        if key in self.data:
+            return False
+        return self.set(key, value)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set_multi(self, mapping, time=0):
+        self.data.update(mapping)
+        return []
+
+    def get_multi(self, keys):
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def incr(self, key, delta=1):
+        # memcached only increments numbers it stored as such
+        if not isinstance(self.data.get(key), int):
+            return None
+        self.data[key] += delta
+        return self.data[key]
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+PAGE = ('<html><body>' + '<p>Lorem ipsum dolor sit amet.</p>' * 200 + '</body></html>').encode('utf-8')
+
+
+class CompressedMemcachedCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = CompressedMemcachedCache('127.0.0.1:11211', {'COMPRESS_MIN_LENGTH': 1024})
+        self.client = self.cache._client = FakeMemcachedClient()
+
+    def stored(self, key):
+        return self.client.data[self.cache.make_key(key)]
+
+    def test_small_values_are_only_pickled(self):
+        self.cache.set('small', {'a': 1})
+        self.assertEqual(self.stored('small')[:1], PICKLED)
+        self.assertEqual(self.cache.get('small'), {'a': 1})
+
+    def test_large_values_are_compressed(self):
+        value = ['the same words'] * 500
+        self.cache.set('large', value)
+        stored = self.stored('large')
+        self.assertEqual(stored[:1], ZLIB_PICKLED)
+        self.assertLess(len(stored), len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        self.assertEqual(self.cache.get('large'), value)
+        stats = self.cache.compression_stats.as_dict()
+        self.assertEqual((stats['values'], stats['compressed']), (1, 1))
+        self.assertGreater(stats['ratio'], 1)
+
+    def test_integers_stay_native_for_incr(self):
+        self.cache.set('count', 1)
+        self.assertEqual(self.stored('count'), 1)
+        self.assertEqual(self.cache.incr('count'), 2)
+        self.assertEqual(self.cache.get('count'), 2)
+
+    def test_booleans_are_pickled(self):
+        self.cache.set('flag', True)
+        self.assertEqual(self.stored('flag')[:1], PICKLED)
+        self.assertIs(self.cache.get('flag'), True)
+
+    def test_many(self):
+        self.cache.set_many({'a': 'x' * 2000, 'b': 3})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'missing']), {'a': 'x' * 2000, 'b': 3})
+
+    def test_add_and_default(self):
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_foreign_values_are_returned_as_stored(self):
+        self.client.data[self.cache.make_key('other')] = b'written elsewhere'
+        self.assertEqual(self.cache.get('other'), b'written elsewhere')
+
+    def test_response_body_is_gzipped(self):
+        response = HttpResponse(PAGE, content_type='text/html')
+        response['Content-Length'] = str(len(PAGE))
+        self.cache.set('page', response)
+        # the response sent to the current client is left alone
+        self.assertEqual(response.content, PAGE)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        cached = self.cache.get('page')
+        self.assertEqual(cached['Content-Encoding'], 'gzip')
+        self.assertEqual(cached['Content-Length'], str(len(cached.content)))
+        self.assertTrue(cached.gzipped_in_cache)
+        self.assertEqual(gzip.decompress(cached.content), PAGE)
+
+    def test_small_response_is_not_gzipped(self):
+        self.cache.set('page', HttpResponse(b'short'))
+        cached = self.cache.get('page')
+        self.assertFalse(cached.has_header('Content-Encoding'))
+        self.assertEqual(cached.content, b'short')
+
+
+class GzipCachedResponseMiddlewareTest(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = GzipCachedResponseMiddleware()
+        cache = CompressedMemcachedCache('127.0.0.1:11211', {})
+        cache._client = FakeMemcachedClient()
+        response = HttpResponse(PAGE, content_type='text/html')
+        response['Content-Length'] = str(len(PAGE))
+        cache.set('page', response)
+        self.cached = cache.get('page')
+
+    def test_gzip_clients_get_the_stored_bytes(self):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        body = self.cached.content
+        response = self.middleware.process_response(request, self.cached)
+        self.assertEqual(response.content, body)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_other_clients_get_identity(self):
+        request = self.factory.get('/')
+        response = self.middleware.process_response(request, self.cached)
+        self.assertEqual(response.content, PAGE)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Content-Length'], str(len(PAGE)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_other_responses_pass_through(self):
+        request = self.factory.get('/')
+        original = HttpResponse(PAGE)
+        response = self.middleware.process_response(request, original)
+        self.assertIs(response, original)
+        self.assertFalse(response.has_header('Vary'))
@@ -20,7 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 from courses.views import CourseListView
-from courses.api import views
+from educa import static as static_views
 
 urlpatterns = [
     url(r'^accounts/login/$', auth_views.login, name='login'),
@@ -32,8 +32,16 @@ urlpatterns = [
     # student registration urls
     url(r'^students/', include('students.urls')),
     url(r'^api/', include('courses.api.urls', namespace='api')),
+    url(r'^analytics/', include('analytics.urls')),
 ]
 
 
 urlpatterns += static(settings.MEDIA_URL,
     document_root=settings.MEDIA_ROOT)
+
+if not settings.DEBUG:
+    # collected, fingerprinted assets with far-future caching headers
+    urlpatterns += [
+        url(r'^{}(?P<path>.*)$'.format(settings.STATIC_URL.lstrip('/')),
+            static_views.serve),
+    ]
@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/1.9/howto/deployment/wsgi/
 
 import os
 
+from educa import startup
+
+# times the imports below when EDUCA_PROFILE_STARTUP is set
+startup.begin()
+
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "educa.settings")
 
 application = get_wsgi_application()
+
+# load URLconfs and compile templates now, before the server forks workers
+application = startup.ready(application)
@@ -0,0 +1,141 @@
+"""
+Bulk student import.
+
+Reads a CSV with a header row and the columns username, password and
+optionally email, first_name and last_name. Passwords are hashed on a
+process pool, since the hashers are deliberately slow and single threaded.
+Users are then inserted with bulk_create() and enrolled in the given courses
+with one insert into the enrollment table per batch.
+
+Rows whose username already exists are skipped. Rows without a password
+get an unusable one, so those students have to reset it before logging in.
+
+Web requests do not import themselves: queue_import() stores the upload
+under STUDENT_IMPORT_DIR and runs the import_students command on it in a
+separate process, away from the request timeout and from the worker's
+threads, which a process pool forked from the worker could deadlock on.
+"""
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from analytics.activity import record_enrollments
+from courses.models import Course
+
+# how long queue_import() keeps the logs of finished imports
+LOG_MAX_AGE = 60 * 60 * 24 * 7 # one week
+
+
+def read_rows(stream):
+    for row in csv.DictReader(stream):
+        row = {key: (value or '').strip() for key, value in row.items() if key}
+        if row.get('username'):
+            yield row
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def hash_password(password):
+    return make_password(password or None)
+
+
+def import_students(stream, course_ids=(), batch_size=1000, processes=None):
+    """
+    Import the students in stream and enroll them in course_ids.
+    Return a (created, skipped) tuple.
+    """
+    Enrollment = Course.students.through
+    course_ids = list(course_ids)
+    created = skipped = 0
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for batch in batches(read_rows(stream), batch_size):
+            seen = set(User.objects.filter(username__in=[row['username'] for row in batch])
+                       .values_list('username', flat=True))
+            rows = []
+            for row in batch:
+                if row['username'] in seen:
+                    skipped += 1
+                    continue
+                seen.add(row['username'])
+                rows.append(row)
+            if not rows:
+                continue
+            chunksize = max(1, len(rows) // (4 * processes))
+            passwords = pool.map(hash_password, [row.get('password') for row in rows],
+                                 chunksize=chunksize)
+            users = [User(username=row['username'],
+                          email=row.get('email', ''),
+                          first_name=row.get('first_name', ''),
+                          last_name=row.get('last_name', ''),
+                          password=password)
+                     for row, password in zip(rows, passwords)]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                if course_ids:
+                    user_ids = User.objects.filter(
+                        username__in=[user.username for user in users]
+                    ).values_list('id', flat=True)
+                    Enrollment.objects.bulk_create([
+                        Enrollment(course_id=course_id, user_id=user_id)
+                        for user_id in user_ids for course_id in course_ids])
+                    # bulk inserts send no m2m_changed signal
+                    for course_id in course_ids:
+                        record_enrollments(course_id, len(users))
+            created += len(users)
+    return created, skipped
+
+
+def queue_import(upload, course_ids=()):
+    """
+    Save upload and start importing it with the import_students command,
+    which deletes the file when done and logs to <file>.log next to it.
+    Logs older than LOG_MAX_AGE are deleted. Return the name of the saved
+    file.
+    """
+    directory = settings.STUDENT_IMPORT_DIR
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    remove_old_logs(directory)
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.csv')
+    try:
+        with os.fdopen(fd, 'wb') as csv_file:
+            for chunk in upload.chunks():
+                csv_file.write(chunk)
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+                   'import_students', path, '--delete']
+        for course_id in course_ids:
+            command += ['--course', str(course_id)]
+        with open(path + '.log', 'wb') as log:
+            subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT,
+                             stdin=subprocess.DEVNULL, close_fds=True)
+    except Exception:
+        # the command never started, nobody else deletes the passwords
+        os.remove(path)
+        raise
+    return os.path.basename(path)
+
+
+def remove_old_logs(directory):
+    expired = time.time() - LOG_MAX_AGE
+    for filename in os.listdir(directory):
+        path = os.path.join(directory, filename)
+        if filename.endswith('.log') and os.path.getmtime(path) < expired:
+            os.remove(path)
@@ -0,0 +1,41 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from students.importer import import_students
+
+
+class Command(BaseCommand):
+    help = 'Create students from a CSV file and enroll them in courses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='CSV with username,password[,email,first_name,last_name].')
+        parser.add_argument('--course', type=int, action='append', default=[], dest='courses',
+                            help='Id of a course to enroll the students in, can be repeated.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Password hashing processes, defaults to the CPU count.')
+        parser.add_argument('--delete', action='store_true', default=False,
+                            help='Delete the CSV file when done, also if the import fails. Used by the import API.')
+
+    def handle(self, *args, **options):
+        try:
+            created, skipped = self.import_file(options)
+        finally:
+            # the file holds plaintext passwords, it goes whether or not the
+            # import worked
+            if options['delete'] and os.path.exists(options['csv_file']):
+                os.remove(options['csv_file'])
+        self.stdout.write('Created {} students, skipped {} existing usernames'.format(
+            created, skipped))
+
+    def import_file(self, options):
+        found = set(Course.objects.filter(id__in=options['courses']).values_list('id', flat=True))
+        missing = set(options['courses']) - found
+        if missing:
+            raise CommandError('Unknown courses: {}'.format(', '.join(map(str, sorted(missing)))))
+        with open(options['csv_file'], newline='', encoding='utf-8') as stream:
+            return import_students(stream, options['courses'],
+                                   batch_size=options['batch_size'],
+                                   processes=options['processes'])
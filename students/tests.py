@@ -1,3 +1,68 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from analytics import activity
+from courses.models import Subject, Course
+from .importer import import_students
 
 # Create your tests here.
+
+CSV = """username,password,email,first_name,last_name
+existing,secret,,,
+alice,secret,alice@example.com,Alice,Smith
+bob,,bob@example.com,,
+alice,other,,,
+"""
+
+
+@override_settings(SNAPSHOT_ROOT=None,
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportStudentsTest(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('instructor', password='secret')
+        subject = Subject.objects.create(title='Programming', slug='programming')
+        self.courses = [Course.objects.create(owner=owner, subject=subject, title=slug,
+                                              slug=slug, overview='')
+                        for slug in ('python', 'django')]
+        User.objects.create_user('existing', password='secret')
+        patcher = mock.patch.object(activity, 'buffer', activity.ActivityBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_creates_users_and_skips_duplicates(self):
+        created, skipped = import_students(io.StringIO(CSV), processes=1)
+        self.assertEqual((created, skipped), (2, 2))
+        alice = User.objects.get(username='alice')
+        self.assertEqual((alice.email, alice.first_name, alice.last_name),
+                         ('alice@example.com', 'Alice', 'Smith'))
+        # the first row of a username wins
+        self.assertTrue(alice.check_password('secret'))
+
+    def test_missing_password_is_unusable(self):
+        import_students(io.StringIO(CSV), processes=1)
+        self.assertFalse(User.objects.get(username='bob').has_usable_password())
+
+    def test_enrolls_new_users_in_every_course(self):
+        course_ids = [course.id for course in self.courses]
+        import_students(io.StringIO(CSV), course_ids, batch_size=2, processes=1)
+        Enrollment = Course.students.through
+        enrolled = set(Enrollment.objects.values_list('course_id', 'user__username'))
+        self.assertEqual(enrolled, {(course_id, username) for course_id in course_ids
+                                    for username in ('alice', 'bob')})
+        self.assertEqual(sum(activity.buffer.counts.values()), 4)
+
+    def test_command_deletes_the_file_when_the_import_fails(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as csv_file:
+            csv_file.write(CSV)
+        with self.assertRaises(CommandError):
+            call_command('import_students', path, '--delete', '--course', '0')
+        self.assertFalse(os.path.exists(path))
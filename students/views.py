@@ -1,9 +1,10 @@
+from django.conf import settings
 from django.core.urlresolvers import reverse_lazy
 from django.views.generic.edit import CreateView, FormView
 from django.contrib.auth.forms import UserCreationForm
 from django.views.generic.list import ListView
 from django.views.generic.detail import DetailView
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import login
 from braces.views import LoginRequiredMixin
 
 from .forms import CourseEnrollForm
@@ -18,11 +19,10 @@ class StudentRegistrationView(CreateView):
 
     def form_valid(self, form):
         result = super(StudentRegistrationView, self).form_valid(form)
-        cd = form.cleaned_data
-        user = authenticate(
-               username=cd['username'],
-               password=cd['password']
-               )
+        # the form has just hashed the password, log the new user in directly
+        # instead of letting authenticate() hash it a second time
+        user = self.object
+        user.backend = settings.AUTHENTICATION_BACKENDS[0]
         login(self.request, user)
         return result
 
@@ -47,27 +47,27 @@ class StudentCourseListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         qs = super(StudentCourseListView, self).get_queryset()
-        return qs.filter(students__in=['self.request.user'])
+        return qs.filter(students__in=[self.request.user])
 
 
 class StudentCourseDetailView(DetailView):
     model = Course
-    template_name = 'students/couse/detail.html'
+    template_name = 'students/course/detail.html'
 
     def get_queryset(self):
         qs = super(StudentCourseDetailView, self).get_queryset()
         return qs.filter(students__in=[self.request.user])
 
-        def get_context_data(self, **kwargs):
-            contex = super(StudentCourseDetailView, self).get_context_data(**kwargs)
-            # get course object
-            course = self.get_object()
-            if 'module_id' in self.kwargs:
-                # get current module
-                context['module'] = course.modules.get(
-                    id=self.kwargs['module_id']
-                )
-            else:
-                # get first module
-                context['module'] = course.modules.all()[0]
-            return context
+    def get_context_data(self, **kwargs):
+        context = super(StudentCourseDetailView, self).get_context_data(**kwargs)
+        # get course object
+        course = self.get_object()
+        if 'module_id' in self.kwargs:
+            # get current module
+            context['module'] = course.modules.get(
+                id=self.kwargs['module_id']
+            )
+        else:
+            # get first module
+            context['module'] = course.modules.all()[0]
+        return context